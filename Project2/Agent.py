@@ -7,8 +7,21 @@
 # def Solve(self,problem)
 #
 # These methods will be necessary for the project's main method to run.
-from itertools import permutations, combinations
-import copy
+from itertools import groupby, permutations
+import time
+
+from ArgMax import ArgMax
+from FigureFeatures import EDGE_COUNTS, Figure, FigureFeatures
+from LRUCache import LRUCache
+from Vocabulary import Vocabulary
+import VectorScoring
+
+# Number of permutations or search nodes map_identity scores between two checks of the deadline
+DEADLINE_INTERVAL = 64
+
+# Weight of an option on an axis of solve3x3 from another row or column than the missing figure, the chains of the
+# first row and column together weigh as much as the row or the column of the missing figure
+CHAIN_AXIS_WEIGHT = 0.5
 
 class Agent:
     # The default constructor for your Agent. Make sure to execute any
@@ -17,7 +30,30 @@ class Agent:
     # Do not add any variables to this signature; they will not be used by
     # main().
     def __init__(self):
-        pass
+        # Object correspondence search used by map_identity and match_figures:
+        # 'exhaustive', 'branch_and_bound' or 'assignment'
+        self.mapping_method = 'exhaustive'
+        # Option scoring used by solve2x1: 'scalar' or 'vector', which needs numpy and falls back to scalar
+        self.scoring_method = 'scalar'
+        # Number of search nodes, permutations or object pairs scored by the last map_identity call
+        self.nodes_explored = 0
+        # Number of options ruled out by each filter stage of the last solve2x1 call
+        self.options_eliminated = {}
+        # Deadline of the current Solve call as a time.time() value, None for no deadline, and whether the answer
+        # of the last Solve call is exact, False if the deadline cut the search short and it is the best found
+        self.deadline = None
+        self.exact = True
+        # Attribute names and values interned to integers, shared by every problem
+        self.vocabulary = Vocabulary()
+        # Similarity points of object pairs, keyed by the compact object signatures
+        self.similarity_cache = LRUCache(10000)
+        # Attribute matrix cells of the objects scored with vector scoring, see VectorScoring.Encoder
+        self.vector_encoder = VectorScoring.Encoder(self.vocabulary)
+        # Answers of solved problems keyed by the problem fingerprint, see get_problem_fingerprint, so only a
+        # problem repeated exactly, names and order included, is answered from the cache, with the answer a cold
+        # solve gives. Computing the fingerprint adds about 5% to the time of a problem that is not in the cache.
+        # None, the default, to always solve: set it to e.g. LRUCache(1000) for problems that repeat
+        self.solution_cache = None
 
     # The primary method for solving incoming Raven's Progressive Matrices.
     # For each problem, your Agent's Solve() method will be called. At the
@@ -41,19 +77,94 @@ class Agent:
     # Solve will be taken as your Agent's answer to this problem.
     #
     # @param problem the RavensProblem your agent should solve
+    # @param deadline optional time.time() value by which to answer with the best answer found so far, see exact
     # @return your Agent's answer to this problem
-    def Solve(self, problem):
-        guess = ''
-
+    def Solve(self, problem, deadline=None):
         # convert problem to python dictionary
-        problem_dict = Util.convert_problem_to_dict(problem)
+        return self.solve_problem(self.convert_problem_to_dict(problem), deadline)
+
+    def solve_many(self, problems):
+        """
+        Method to solve a batch of problems in order, with the state of the agent shared across the batch: the
+        vocabulary, the similarity cache, and the solution cache if it is set. The problems are neither converted
+        up front nor reordered, both made the batch slower than solving the problems one by one
+
+        :param problems: list of RavensProblem
+        :return: list of answers, in the order of problems
+        """
+        return [self.Solve(problem) for problem in problems]
+
+    def solve_problem(self, problem_dict, deadline=None):
+        """
+        Method to solve a problem converted by convert_problem_to_dict. With a deadline the searches stop once it
+        has passed and the best answer found so far is returned, exact tells if that happened
+
+        :param problem_dict:
+        :param deadline: time.time() value, None for no deadline
+        :return: the name of the answer option, '' if the type is not supported
+        """
+        guess = ''
         figures = problem_dict.get('figures')
+        self.deadline = deadline
+        self.exact = True
+
+        # a problem that is the same as a solved one, names and order included, has the same answer
+        fingerprint = None
+        if self.solution_cache is not None:
+            fingerprint = self.get_problem_fingerprint(problem_dict)
+            cached = self.solution_cache.get(fingerprint)
+            if cached is not None:
+                return cached
 
         if problem_dict.get('type') == '2x1':
             guess = self.solve2x1(figures)
+        elif problem_dict.get('type') == '2x2':
+            guess = self.solve2x2(figures)
+        elif problem_dict.get('type') == '3x3':
+            guess = self.solve3x3(figures)
+
+        # only exact answers are kept, a later call with more time may find a better one
+        if fingerprint is not None and self.exact:
+            self.solution_cache.put(fingerprint, guess)
 
         return guess
 
+    def is_past_deadline(self):
+        """
+        Method to check if the deadline of the current Solve call has passed, which makes its answer inexact
+
+        :return:
+        """
+        if self.deadline is not None and time.time() >= self.deadline:
+            self.exact = False
+            return True
+        return False
+
+    def get_problem_fingerprint(self, problem_dict):
+        """
+        Method to get a fingerprint of a problem that is the same only for problems the solver cannot tell apart:
+        the type, the mapping and scoring methods, and every figure, object, attribute and value in the order they
+        are visited. The answer depends on object names, which the mappings and guess figures match objects by, and
+        on the order of the options and objects, which breaks ties, so none of them is left out
+
+        :param problem_dict:
+        :return:
+        """
+        return (problem_dict.get('type'), self.mapping_method, self.scoring_method,
+                tuple((name, tuple((object_name, tuple((attr, tuple(val) if val is not None else None)
+                                                       for attr, val in obj.iteritems()))
+                                   for object_name, obj in figure.iteritems()))
+                      for name, figure in problem_dict.get('figures').iteritems()))
+
+    def convert_problem_to_dict(self, problem):
+        """
+        Method to convert the RPM into python dictionary, see Util.convert_problem_to_dict
+
+        :param problem:
+        :return:
+        """
+        return Util.convert_problem_to_dict(problem)
+
     def solve2x1(self, figures):
         """
         Method for solving 2x1 RPM
@@ -72,73 +183,73 @@ class Agent:
         guess = self.create_guess_figure(figures, semantic_network_ab, ab_map, ac_map)
 
         num_diff_ab = len(figures.get('A')) - len(figures.get('B'))
-        fig_c_shape = self.get_shape(figures.get('C'))
+        match_shape = ab_map.get('matchShape')
 
-        matches = []
-        options = {}
+        # Filter the options in stages, cheapest first, counting the options each stage rules out
+        self.options_eliminated = {'objectCount': 0, 'shape': 0, 'attributeBound': 0, 'guessBound': 0}
+        bounds = []
         options_name = [n for n in figures.keys() if n not in ['A', 'B', 'C']]
-        # For each option 1 through 6, match option to the guess figure
-        for name in options_name:
-            option = figures.get(name)
-
-            # Assume that the difference between A to B and C to D should be the same
-            # i.e. if the objects are deleted or added in A to B, then C to D should get the same transformation
-            num_diff_cd = len(figures.get('C')) - len(option)
-            if num_diff_ab != num_diff_cd:
-                continue
-
-            # Check if ab_map.get('matchShape') is True, then C to D should be matched my shape as well
-            # If shape is different between C and 1 throught 6, ignore
-            if ab_map.get('matchShape'):
-                fig_d_shape = self.get_shape(figures.get(name))
-                if not set(fig_c_shape) <= set(fig_d_shape) and not set(fig_d_shape) <= set(fig_c_shape):
+        for index, name in enumerate(options_name):
+            stage = self.get_option_rejection(figures.get('C'), figures.get(name), num_diff_ab, match_shape)
+            if stage is not None:
+                self.options_eliminated[stage] += 1
+            else:
+                bounds.append((self.get_option_attribute_bound(figures.get(name), len(guess), match_shape), index,
+                               name))
+
+        # For each option, most promising first, match option to the guess figure. The options are ranked by
+        # their original order, so of the options with the most points the first one wins. An option is skipped
+        # when a bound of its weight cannot beat the best option so far. The options are scored in the groups of
+        # get_scoring_groups. Past the deadline the options left are not scored
+        guess_values = self.get_value_sets(guess).values()
+        best = ArgMax(keep_ties=True)
+        bounds = sorted(bounds, key=lambda x: (-x[0], x[1]))
+        for group in self.get_scoring_groups(bounds):
+            if self.is_past_deadline():
+                break
+            scored = []
+            for bound, index, name in group:
+                if not best.beats(bound, index):
+                    self.options_eliminated['attributeBound'] += 1
+                    continue
+                if best.score is not None and \
+                        not best.beats(self.get_option_bound(figures.get(name), guess_values, figures.get('C'),
+                                                             match_shape), index):
+                    self.options_eliminated['guessBound'] += 1
                     continue
 
-            # Normalize the object name
-            cd_map = self.map_identity(figures.get('C'), option, ab_map.get('matchShape'))
-            object_name_set = set(option.keys()) | set(figures.get('C'))
-            new_guess = self.get_normalized_name_guess(guess, cd_map, object_name_set)
-
-            options[name] = new_guess
-
-            # Find the most similar figures between option and C
-            match = self.match_figures_new(option, new_guess, cd_map, ab_map.get('matchShape'))
-            match['name'] = name
-            matches.append(match)
-
-        matches = sorted(matches, key=lambda x: x.get('weight'), reverse=True)
+                # Find the most similar figures between option and C
+                scored.append((index, name, self.get_option_candidate(figures.get('C'), figures.get(name), guess,
+                                                                      num_diff_ab, match_shape)))
+            if not scored:
+                continue
+            weights = self.score_options([candidate for index, name, candidate in scored], match_shape)
+            for (index, name, candidate), weight in zip(scored, weights):
+                best.add(weight, {'weight': weight, 'name': name}, index)
 
-        match_list = []
-        for match in matches:
-            if match.get('weight') == matches[0].get('weight'):
-                match_list.append(match)
-        matches = match_list
+        # the options with the most points, or the most promising option if none was scored before the deadline
+        matches = best.get_ties()
+        if not matches and bounds:
+            matches = [{'weight': None, 'name': bounds[0][2]}]
 
         # if unsure and matches length is exactly the number of options and all the options are unique,
         # then we assume this is special polygon case
-        edge_map = {
-            'triangle': 3,
-            'square': 4,
-            'pentagon': 5,
-            'hexagon': 6,
-            'heptagon': 7,
-            'octagon': 8
-        }
-
         shape_list = []
         for name in options_name:
             shape_list += self.get_shape(figures.get(name))
-        if len(set(shape_list)) == len(set(edge_map.keys())):
-            m_list = []
 
-            edge_count_a = self.get_edge_count(figures.get('A'), edge_map)
-            edge_count_b = self.get_edge_count(figures.get('B'), edge_map)
-            edge_count_c = self.get_edge_count(figures.get('C'), edge_map)
+        edge_count_a = self.get_edge_count(figures.get('A'))
+        edge_count_b = self.get_edge_count(figures.get('B'))
+        edge_count_c = self.get_edge_count(figures.get('C'))
+
+        if set(shape_list) == set(EDGE_COUNTS.keys()) and edge_count_a and edge_count_b is not None and \
+                edge_count_c is not None:
+            m_list = []
 
             ratio = edge_count_b / float(edge_count_a)
 
             for name in options_name:
-                edge_count_d = self.get_edge_count(figures.get(name), edge_map)
+                edge_count_d = self.get_edge_count(figures.get(name))
                 if (edge_count_c * ratio) == edge_count_d:
                     m_list.append({'weight': 1, 'name': name})
                     break
@@ -148,6 +259,355 @@ class Agent:
 
         return matches[0].get('name')
 
+    def solve2x2(self, figures):
+        """
+        Method for solving 2x2 RPM, see solve_square
+
+        :param figures:
+        :return:
+        """
+        ab_map = self.map_identity(figures.get('A'), figures.get('B'))
+        ac_map = self.map_identity(figures.get('A'), figures.get('C'))
+
+        return self.solve_square(figures, 'A', 'B', 'C', ab_map, ac_map)
+
+    def solve3x3(self, figures):
+        """
+        Method for solving 3x3 RPM. The missing figure completes the square E, F, H of the last two rows and
+        columns, so it is solved as that square, see solve_square, and checked against the chains of the other rows
+        and columns: the second step B to C of the row A, B, C applied to H, and the second step D to G of the
+        column A, D, G applied to F. The object correspondence of each chain follows the chain through E, B to E to
+        H and D to E to F, so it reuses the E to F and E to H mappings instead of mapping B to H and D to F. Each of
+        the six pairs is mapped once, and the second steps are the only steps the missing figure continues, so A is
+        not read
+
+        :param figures:
+        :return:
+        """
+        ef_map = self.map_identity(figures.get('E'), figures.get('F'))
+        eh_map = self.map_identity(figures.get('E'), figures.get('H'))
+        bc_map = self.map_identity(figures.get('B'), figures.get('C'))
+        dg_map = self.map_identity(figures.get('D'), figures.get('G'))
+        be_map = self.map_identity(figures.get('B'), figures.get('E'), False)
+        de_map = self.map_identity(figures.get('D'), figures.get('E'), False)
+
+        chain_axes = [
+            self.get_axis(figures.get('B'), figures.get('C'), bc_map, figures.get('H'),
+                          self.get_composed_map(be_map, eh_map)),
+            self.get_axis(figures.get('D'), figures.get('G'), dg_map, figures.get('F'),
+                          self.get_composed_map(de_map, ef_map))
+        ]
+
+        return self.solve_square(figures, 'E', 'F', 'H', ef_map, eh_map, chain_axes)
+
+    def solve_square(self, figures, name_a, name_b, name_c, ab_map, ac_map, chain_axes=()):
+        """
+        Method to solve the square A, B, C of the matrix whose missing figure is one of the options. The row
+        transformation A to B applied to C and the column transformation A to C applied to B give two guess
+        figures, and each option is scored against both. The A to B and A to C mappings and semantic networks are
+        computed once and each mapping is used for both axes: as the transformation of its own axis and as the
+        object correspondence of the other
+
+        :param figures:
+        :param name_a:
+        :param name_b:
+        :param name_c:
+        :param ab_map:
+        :param ac_map:
+        :param chain_axes: further axes, see get_axis, applied to C or B, each option is scored against them too,
+                           with weight CHAIN_AXIS_WEIGHT
+        :return:
+        """
+        figure_a, figure_b, figure_c = figures.get(name_a), figures.get(name_b), figures.get(name_c)
+
+        # the axes of the row and the column, create_guess_figure applies the transformation to the objects of
+        # figure 'C', for the column it is B
+        axes = [self.get_axis(figure_a, figure_b, ab_map, figure_c, ac_map),
+                self.get_axis(figure_a, figure_c, ac_map, figure_b, ab_map)] + list(chain_axes)
+        axis_factors = [1, 1] + [CHAIN_AXIS_WEIGHT] * len(chain_axes)
+
+        # the options most promising first, by the weighted sum of the bounds of their weights on all axes, see
+        # get_option_attribute_bound. They are ranked by name, so of the options with the most points the first one
+        # wins, and an option whose bound cannot beat the best option so far is skipped
+        options_name = sorted(n for n in figures.keys() if n.isdigit())
+        bounds = sorted(((sum(factor * self.get_option_attribute_bound(figures.get(name), len(axis[1]), axis[3])
+                              for axis, factor in zip(axes, axis_factors)), index, name)
+                         for index, name in enumerate(options_name)),
+                        key=lambda x: (-x[0], x[1]))
+
+        # an option is kept if every axis accepts it. The C to option mapping of the row seeds the B to option
+        # mapping of the column, and the chain axes reuse the mapping of the row or the column from the same figure.
+        # The options are scored in the groups of get_scoring_groups. Past the deadline the options left are not
+        # scored
+        best = ArgMax()
+        for group in self.get_scoring_groups(bounds):
+            if self.is_past_deadline():
+                break
+            scored = []
+            for bound, index, name in group:
+                if not best.beats(bound, index):
+                    continue
+                row_candidate = self.get_option_candidate(figure_c, figures.get(name), axes[0][1], axes[0][2],
+                                                          axes[0][3])
+                if row_candidate is None:
+                    continue
+                seed = self.get_chained_seed(ab_map, ac_map, row_candidate[2])
+                column_candidate = self.get_option_candidate(figure_b, figures.get(name), axes[1][1], axes[1][2],
+                                                             axes[1][3], seed)
+                if column_candidate is None:
+                    continue
+                candidates = [row_candidate, column_candidate]
+                for figure, guess, num_diff, match_shape in axes[2:]:
+                    axis = 0 if figure is figure_c else 1
+                    cd_map = candidates[axis][2]
+                    candidate = self.get_option_candidate(figure, figures.get(name), guess, num_diff, match_shape,
+                                                          cd_map, cd_map if match_shape == axes[axis][3] else None)
+                    if candidate is None:
+                        break
+                    candidates.append(candidate)
+                else:
+                    scored.append((index, name, candidates))
+            if not scored:
+                continue
+            # the weights of every option on each axis
+            axis_weights = [self.score_options([candidates[axis] for index, name, candidates in scored], axes[axis][3])
+                            for axis in range(len(axes))]
+            for (index, name, candidates), weights in zip(scored, zip(*axis_weights)):
+                best.add(sum(factor * weight for factor, weight in zip(axis_factors, weights)), name, index)
+
+        # the most promising option if none was scored before the deadline
+        if best.item is None and not self.exact and bounds:
+            return bounds[0][2]
+        return best.item if best.item is not None else ''
+
+    def get_axis(self, figure_x, figure_y, xy_map, figure_c, xc_map):
+        """
+        Method to get an axis of the matrix: the transformation X to Y applied to C gives a guess figure of the
+        missing figure
+
+        :param figure_x:
+        :param figure_y:
+        :param xy_map: the X to Y mapping, the transformation
+        :param figure_c: the figure the transformation is applied to
+        :param xc_map: the X to C mapping, the object of C each object of X corresponds to
+        :return: (figure_c, guess, number of objects deleted by the transformation, match shape)
+        """
+        semantic_network_xy = self.get_semantic_network(figure_x, figure_y, xy_map)
+        return (figure_c, self.create_guess_figure({'C': figure_c}, semantic_network_xy, xy_map, xc_map),
+                len(figure_x) - len(figure_y), xy_map.get('matchShape'))
+
+    def get_composed_map(self, xy_map, yz_map):
+        """
+        Method to follow each object of X to Y and on to Z
+
+        :param xy_map:
+        :param yz_map:
+        :return: {X object: Z object or None}, matched by shape if both mappings are
+        """
+        xz_map = dict((x_name, yz_map.get(y_name)) for x_name, y_name in xy_map.iteritems()
+                      if x_name != 'matchShape')
+        xz_map['matchShape'] = xy_map.get('matchShape') and yz_map.get('matchShape')
+        return xz_map
+
+    def get_scoring_groups(self, bounds):
+        """
+        Method to split the options, sorted by the bounds of their weights, into the groups that are scored
+        together. Scalar scoring scores one option at a time, so each option is checked against every option scored
+        before it. Vector scoring scores the options of equal bound in one pass of score_options, checking them
+        against the options of the groups before
+
+        :param bounds: list of (bound, index, name), sorted by decreasing bound
+        :return: list of lists of (bound, index, name)
+        """
+        if self.scoring_method == 'vector' and VectorScoring.numpy is not None:
+            return [list(group) for bound, group in groupby(bounds, key=lambda x: x[0])]
+        return [[entry] for entry in bounds]
+
+    def get_chained_seed(self, qx_map, qp_map, py_map):
+        """
+        Method to guess the mapping X to Y of a square Q, P, X, Y of the matrix from the mappings of its other three
+        sides: each object of X is followed back to Q, across to P and down to Y
+        i.e. Q -> P
+             |    |
+             X -> Y
+
+        :param qx_map:
+        :param qp_map:
+        :param py_map:
+        :return: {X object: Y object} for the objects followed to the end, None if a mapping is missing
+        """
+        if qx_map is None or qp_map is None or py_map is None:
+            return None
+        xq_map = dict((x_name, q_name) for q_name, x_name in qx_map.iteritems()
+                      if q_name != 'matchShape' and x_name is not None)
+        seed = {}
+        for x_name, q_name in xq_map.iteritems():
+            y_name = py_map.get(qp_map.get(q_name))
+            if y_name is not None:
+                seed[x_name] = y_name
+        return seed
+
+    def get_option_candidate(self, figure_c, option, guess, num_diff_ab, match_shape, seed=None, cd_map=None):
+        """
+        Method to rule out an option that the transformation cannot give, or else to rename the objects of the guess
+        figure to the objects of the option
+
+        :param figure_c: the figure the transformation is applied to
+        :param option:
+        :param guess: the guess figure, with the object names of figure_c
+        :param num_diff_ab: number of objects deleted by the transformation
+        :param match_shape: whether the transformation matched objects by shape
+        :param seed: a likely mapping of figure_c to the option, see map_identity
+        :param cd_map: the mapping of figure_c to the option, if it is already known
+        :return: (option, normalized guess, cd_map), None if the option is ruled out
+        """
+        if self.get_option_rejection(figure_c, option, num_diff_ab, match_shape) is not None:
+            return None
+
+        fig_c_features = self.get_features(figure_c)
+        fig_d_features = self.get_features(option)
+
+        # Normalize the object name
+        if cd_map is None:
+            cd_map = self.map_identity(figure_c, option, match_shape, seed)
+        object_name_set = fig_d_features.object_names | fig_c_features.object_names
+        new_guess = self.get_normalized_name_guess(guess, cd_map, object_name_set)
+
+        return option, new_guess, cd_map
+
+    def get_option_rejection(self, figure_c, option, num_diff_ab, match_shape):
+        """
+        Method to check if the transformation cannot give an option, without mapping its objects
+
+        :param figure_c: the figure the transformation is applied to
+        :param option:
+        :param num_diff_ab: number of objects deleted by the transformation
+        :param match_shape: whether the transformation matched objects by shape
+        :return: 'objectCount' or 'shape', the check that ruled out the option, None if it is not ruled out
+        """
+        # Assume that the difference between A to B and C to D should be the same
+        # i.e. if the objects are deleted or added in A to B, then C to D should get the same transformation
+        num_diff_cd = len(figure_c) - len(option)
+        if num_diff_ab != num_diff_cd:
+            return 'objectCount'
+
+        # Check if ab_map.get('matchShape') is True, then C to D should be matched my shape as well
+        # If shape is different between C and 1 throught 6, ignore
+        if match_shape:
+            fig_c_shape = self.get_features(figure_c).shape_set
+            fig_d_shape = self.get_features(option).shape_set
+            if not fig_c_shape <= fig_d_shape and not fig_d_shape <= fig_c_shape:
+                return 'shape'
+
+        return None
+
+    def get_option_attribute_bound(self, option, num_guess_objects, by_shape=False):
+        """
+        Method to get an upper bound of the weight match_figures_new can give an option from its attributes alone. An
+        object scores at most a point per attribute, two for a position attribute, and a point for its shape when
+        matching by shape, and at most as many objects as the guess figure has are scored
+
+        :param option:
+        :param num_guess_objects:
+        :param by_shape:
+        :return:
+        """
+        features = self.get_features(option)
+        object_bounds = []
+        for name, obj in option.iteritems():
+            non_relational = len(features.non_relational.get(name))
+            if 'shape' in obj:
+                non_relational -= 1
+            object_bounds.append(2 * len(features.relational.get(name)) + non_relational +
+                                 (1 if by_shape and obj.get('shape') is not None else 0))
+        return sum(sorted(object_bounds, reverse=True)[:num_guess_objects])
+
+    def get_option_bound(self, option, guess_values, figure_c, by_shape=False):
+        """
+        Method to get an upper bound of the weight match_figures_new can give an option against the guess figure
+        normalized to it, without mapping the objects. Each option object gets the most points it can score against
+        any guess object, or none if it is left unmatched, and at most as many objects as the guess figure has are
+        matched. Attributes that get_normalized_name_guess may rename are assumed to match at best
+
+        :param option:
+        :param guess_values: value sets of the guess figure objects, see get_value_sets
+        :param figure_c:
+        :param by_shape:
+        :return:
+        """
+        option_features = self.get_features(option)
+        # the values get_normalized_name_guess renames, and the object names of the normalized guess
+        renamed_names = option_features.object_names | self.get_features(figure_c).object_names
+        renamed = [dict((attr, val is not None and val <= renamed_names) for attr, val in guess_obj.iteritems())
+                   for guess_obj in guess_values]
+
+        object_bounds = []
+        for name, obj in self.get_value_sets(option).iteritems():
+            relational = option_features.relational.get(name)
+            best_points = 0
+            for guess_obj, guess_renamed in zip(guess_values, renamed):
+                points = 0
+                if by_shape and obj.get('shape') is not None and obj.get('shape') == guess_obj.get('shape'):
+                    points += 1
+                if len(guess_obj) == 0:
+                    points -= 1
+                for attr, val in obj.iteritems():
+                    if attr == 'shape':
+                        continue
+                    if attr not in guess_obj:
+                        if attr not in relational:
+                            points -= 1
+                    elif guess_renamed.get(attr) or (val is not None and guess_obj.get(attr) == val):
+                        points += 2 if attr in relational else 1
+                    elif by_shape:
+                        points += 0.5
+                for attr in guess_obj:
+                    if attr != 'shape' and attr not in obj and not guess_renamed.get(attr):
+                        points -= 1
+                best_points = max(best_points, points)
+            object_bounds.append(best_points)
+
+        return sum(sorted(object_bounds, reverse=True)[:len(guess_values)])
+
+    def get_value_sets(self, figure):
+        """
+        Method to get the objects of a figure with their values as sets, since the order of the values does not
+        matter when comparing them
+        i.e. {'Z': {'inside': ['Y', 'X']}} -> {'Z': {'inside': frozenset(['X', 'Y'])}}
+
+        :param figure:
+        :return:
+        """
+        return dict((name, dict((attr, frozenset(val) if val is not None else None) for attr, val in obj.iteritems()))
+                    for name, obj in figure.iteritems())
+
+    def get_features(self, figure):
+        """
+        Method to get the FigureFeatures of a figure. The problem figures get theirs when they are converted,
+        the figures built by the agent have them computed here
+
+        :param figure:
+        :return:
+        """
+        if isinstance(figure, Figure):
+            return figure.features
+        return FigureFeatures(figure)
+
+    def get_compact_figure(self, figure):
+        """
+        Method to get the compact objects of a figure, see Vocabulary.get_compact_figure. The problem figures keep
+        theirs once converted with the vocabulary of the agent, the figures built by the agent are converted here
+
+        :param figure:
+        :return:
+        """
+        if not isinstance(figure, Figure):
+            return self.vocabulary.get_compact_figure(figure)
+        features = figure.features
+        if features.compact is None or features.compact[0] is not self.vocabulary:
+            features.compact = (self.vocabulary, self.vocabulary.get_compact_figure(figure))
+        return features.compact[1]
+
     def get_shape(self, figure):
         """
         Method to get shape from all objects in the figure
@@ -155,18 +615,16 @@ class Agent:
         :param figure:
         :return:
         """
-        return [shape for name, sublist in figure.iteritems() for shape in sublist.get('shape')]
-    
-    def get_edge_count(self, figure, edge_map):
+        return self.get_features(figure).shapes
+
+    def get_edge_count(self, figure):
         """
-        Method to get the edge count
+        Method to get the edge count, None if a shape is not a polygon
 
         :param figure:
-        :param edge_map:
         :return:
         """
-        edge_list = [edge_map.get(shape) for name, obj in figure.iteritems() for shape in obj.get('shape')]
-        return sum(edge_list)
+        return self.get_features(figure).edge_count
 
     def create_guess_figure(self, figures, semantic_network_ab, ab_map, ac_map):
         """
@@ -182,7 +640,11 @@ class Agent:
         guess = {}
         for src_name, dest_name in ac_map.iteritems():
             if src_name != 'matchShape':
+                # the object of C with the name of the object of A, or the object it is mapped to if C has no such
+                # name, or no attributes if it is mapped to no object
                 obj_c = figures.get('C').get(src_name)
+                if obj_c is None:
+                    obj_c = figures.get('C').get(dest_name, {})
 
                 ab = str(src_name) + '->' + str(ab_map.get(src_name))
                 ab_transform = semantic_network_ab.get(ab)
@@ -232,12 +694,13 @@ class Agent:
         :return:
         """
         new_guess = {}
-        guess_clone = copy.deepcopy(guess)
         for src_name, dest_name in cd_map.iteritems():
             if src_name != 'matchShape':
-                if src_name in guess_clone:
-                    new_guess[dest_name] = guess_clone.get(src_name)
-                    for attr_name, val in guess_clone.get(src_name).iteritems():
+                if src_name in guess:
+                    # Copy on write: the renamed object shares the value lists of the guess object,
+                    # only the position attributes get new lists with the renamed objects
+                    new_guess[dest_name] = dict(guess.get(src_name))
+                    for attr_name, val in guess.get(src_name).iteritems():
                         if val is not None and set(val) <= object_name_set:
                             new_guess[dest_name][attr_name] = []
                             for rel_name in val:
@@ -248,6 +711,33 @@ class Agent:
 
         return new_guess
 
+    def score_options(self, candidates, by_shape=False):
+        """
+        Method to score every option against its normalized guess figure, one by one with match_figures_new or,
+        if scoring_method is 'vector' and numpy is installed, all at once with VectorScoring
+
+        :param candidates: list of (option figure, guess figure, cd_map)
+        :param by_shape:
+        :return: list of the weight of each candidate
+        """
+        if self.scoring_method == 'vector' and VectorScoring.numpy is not None:
+            return VectorScoring.score_options(self.vector_encoder, [self.get_compact_pair(option, guess)
+                                                                     for option, guess, cd_map in candidates],
+                                               by_shape)
+        return [self.match_figures_new(option, guess, cd_map, by_shape).get('weight')
+                for option, guess, cd_map in candidates]
+
+    def get_compact_pair(self, option_figure, guess_figure):
+        """
+        Method to get the compact objects of an option and its guess figure, and the value mask of their object names
+
+        :param option_figure:
+        :param guess_figure:
+        :return: (compact option figure, compact guess figure, name mask)
+        """
+        name_mask = self.vocabulary.get_value_mask(set(option_figure.keys()) | set(guess_figure.keys()))
+        return self.get_compact_figure(option_figure), self.get_compact_figure(guess_figure), name_mask
+
     def match_figures_new(self, option_figure, guess_figure, cd_map, by_shape=False):
         """
         Method to match option figure and guess figure
@@ -258,16 +748,16 @@ class Agent:
         :param by_shape:
         :return:
         """
-        object_name_set = set(option_figure.keys()) | set(guess_figure.keys())
+        compact_option, compact_guess, name_mask = self.get_compact_pair(option_figure, guess_figure)
 
         similarity_points = 0
 
-        for name, obj in option_figure.iteritems():
-            option_obj = option_figure.get(name)
-            guess_obj = guess_figure.get(name)
+        for name, obj in compact_option.iteritems():
+            option_obj = compact_option.get(name)
+            guess_obj = compact_guess.get(name)
 
             if guess_obj is not None:
-                similarity_points += self.get_similarity_points(option_obj, guess_obj, object_name_set, by_shape)
+                similarity_points += self.get_compact_similarity_points(option_obj, guess_obj, name_mask, by_shape)
 
         return {'weight': similarity_points}
 
@@ -278,7 +768,8 @@ class Agent:
         """
         object_name_set = set(option_figure.keys()) | set(guess_figure.keys())
 
-        new_option_figure = copy.deepcopy(option_figure)
+        # the objects are only read, padding needs a new figure dictionary but not new objects
+        new_option_figure = dict(option_figure)
         extra = []
         if len(option_figure.keys()) < len(object_name_set):
             extra = object_name_set - set(option_figure.keys())
@@ -287,33 +778,91 @@ class Agent:
         for o in extra:
             new_option_figure[o] = {}
 
-        permute_list = get_possible_permutation(new_option_figure, guess_figure)
-
-        matches_list = []
-
-        for pair_list in permute_list:
+        name_mask = self.vocabulary.get_value_mask(object_name_set)
+        compact_option = self.get_compact_figure(new_option_figure)
+        compact_guess = self.get_compact_figure(guess_figure)
+
+        if self.mapping_method == 'assignment':
+            def get_points(option_name, guess_name):
+                return self.get_match_points(compact_option.get(option_name), compact_guess.get(guess_name),
+                                             name_mask, by_shape)
+
+            pair_list, similarity_points = self.get_assignment_pairs(new_option_figure.keys(), guess_figure.keys(),
+                                                                     get_points)
+            return {'weight': similarity_points, 'pairList': pair_list}
+
+        # the same object pair shows up in many permutations, score it once
+        pair_points = dict(((option_name, guess_name),
+                            self.get_match_points(compact_option.get(option_name), compact_guess.get(guess_name),
+                                                  name_mask, by_shape))
+                           for option_name in new_option_figure for guess_name in guess_figure)
+
+        # keep the first permutation with the most points, a permutation that gets the most points any
+        # permutation can get ends the search
+        best_match = ArgMax(self.get_max_points(new_option_figure.keys(), guess_figure.keys(), pair_points))
+        for pair_list in iter_possible_permutation(new_option_figure, guess_figure):
             similarity_points = 0
             for pair in pair_list:
-                option_obj = new_option_figure.get(pair[0])
-                guess_obj = guess_figure.get(pair[1])
+                if pair[1] is not None:
+                    similarity_points += pair_points.get(pair)
+
+            best_match.add(similarity_points, pair_list)
+            if best_match.done or (best_match.count % DEADLINE_INTERVAL == 0 and self.is_past_deadline()):
+                break
+
+        return {'weight': best_match.score, 'pairList': best_match.item}
+
+    def get_max_points(self, src_objects, dest_objects, pair_points, by_shape=False):
+        """
+        Method to get the most points a permutation of iter_possible_permutation can get, every object of the
+        smaller figure paired with its best object of the other figure. When matching by shape a shape mismatch ends
+        the scoring of a permutation, so an object never adds less than no points
 
-                if guess_figure.get(pair[1]) is not None:
-                    option_obj_shape = option_obj.get('shape')
-                    guess_obj_shape = guess_obj.get('shape')
-                    is_shape_equal = False
-                    if option_obj_shape is not None and guess_obj_shape is not None:
-                        if set(option_obj_shape) == set(guess_obj_shape):
-                            is_shape_equal = True
-                    # if we are comparing by shape and shape is equal, add extra point
-                    if by_shape and is_shape_equal:
-                        similarity_points += 1
-                    similarity_points += self.get_similarity_points(option_obj, guess_obj, object_name_set)
+        :param src_objects:
+        :param dest_objects:
+        :param pair_points: {(src object, dest object): points}, None for a shape mismatch
+        :param by_shape:
+        :return:
+        """
+        if len(src_objects) >= len(dest_objects):
+            rows = [[pair_points.get((src_name, dest_name)) for src_name in src_objects] for dest_name in dest_objects]
+        else:
+            rows = [[pair_points.get((src_name, dest_name)) for dest_name in dest_objects] for src_name in src_objects]
+
+        max_points = 0
+        for row in rows:
+            points = [p for p in row if p is not None]
+            best_points = max(points) if len(points) else 0
+            if by_shape:
+                best_points = max(best_points, 0)
+            max_points += best_points
+        return max_points
+
+    def get_match_points(self, option_obj, guess_obj, name_mask, by_shape=False):
+        """
+        Method to calculate the points of matching a compact option object to a compact guess object
 
-            matches_list.append({'weight': similarity_points, 'pairList': pair_list})
+        :param option_obj:
+        :param guess_obj:
+        :param name_mask:
+        :param by_shape:
+        :return:
+        """
+        similarity_points = 0
 
-        matches_list = sorted(matches_list, key=lambda x: x.get('weight'), reverse=True)
+        shape_id = self.vocabulary.get_attribute_id('shape')
+        option_obj_shape = option_obj.masks.get(shape_id)
+        guess_obj_shape = guess_obj.masks.get(shape_id)
+        is_shape_equal = False
+        if option_obj_shape is not None and guess_obj_shape is not None:
+            if option_obj_shape == guess_obj_shape:
+                is_shape_equal = True
+        # if we are comparing by shape and shape is equal, add extra point
+        if by_shape and is_shape_equal:
+            similarity_points += 1
+        similarity_points += self.get_compact_similarity_points(option_obj, guess_obj, name_mask)
 
-        return matches_list[0]
+        return similarity_points
 
     def get_semantic_network(self, figure1, figure2, relationship_map):
         """
@@ -324,7 +873,7 @@ class Agent:
         :param relationship_map:
         :return:
         """
-        object_name_set = set(figure1.keys()) | set(figure2.keys())
+        object_name_set = self.get_features(figure1).object_names | self.get_features(figure2).object_names
         transformation_map = {}
 
         for src_name, dest_name in relationship_map.iteritems():
@@ -438,70 +987,347 @@ class Agent:
                 }
         return pos_map
 
-    def map_identity(self, figure1, figure2, by_shape=True):
+    def map_identity(self, figure1, figure2, by_shape=True, seed=None):
         """
         Check relationship between two figures
             1. First, check by shape, continue check by attributes
             2. If shapes do not match, check by attributes
         :param figure1:
         :param figure2:
+        :param by_shape:
+        :param seed: a likely, possibly partial, {figure1 object: figure2 object} mapping. Only branch_and_bound
+                     uses it, to bound its search, the result does not depend on it
         :return:
         """
+        if self.mapping_method == 'branch_and_bound':
+            return self.map_identity_branch_and_bound(figure1, figure2, by_shape, seed)
+        elif self.mapping_method == 'assignment':
+            return self.map_identity_assignment(figure1, figure2, by_shape)
 
-        permute_list = get_possible_permutation(figure1, figure2)
 
-        object_name_set = set(figure1.keys()) | set(figure2.keys())
+        object_name_set = self.get_features(figure1).object_names | self.get_features(figure2).object_names
+        name_mask = self.vocabulary.get_value_mask(object_name_set)
+        compact_figure1 = self.get_compact_figure(figure1)
+        compact_figure2 = self.get_compact_figure(figure2)
 
-        # if shapes in f2 is a subset of shapes in f1, do shape similarity
-        shapes_figure1 = [shape for name, sublist in figure1.iteritems() for shape in sublist.get('shape')]
-        shapes_figure2 = [shape for name, sublist in figure2.iteritems() for shape in sublist.get('shape')]
-
-        match_by_shape = False  # match by shape or attributes
-        if set(shapes_figure1) <= set(shapes_figure2) or set(shapes_figure1) >= set(shapes_figure2):
-            match_by_shape = True and by_shape
+        match_by_shape = self.get_match_by_shape(figure1, figure2, by_shape)
 
         relationship_map = {
             'matchShape': match_by_shape
         }
 
 
-        matches_list = []
-        for pair_list in permute_list:
+        # the same object pair shows up in many permutations, score it once. None marks a shape mismatch
+        pair_points = {}
+        for src_name in figure1:
+            for dest_name in figure2:
+                f1 = compact_figure1.get(src_name)
+                f2 = compact_figure2.get(dest_name)
+                if not match_by_shape:
+                    pair_points[(src_name, dest_name)] = self.get_compact_similarity_points(f1, f2, name_mask)
+                elif self.is_shape_equal(f1, f2):
+                    pair_points[(src_name, dest_name)] = self.get_compact_similarity_points(f1, f2, name_mask,
+                                                                                             match_by_shape)
+                else:
+                    pair_points[(src_name, dest_name)] = None
+
+        # keep the first permutation with the most points, a permutation that gets the most points any
+        # permutation can get ends the search
+        best_match = ArgMax(self.get_max_points(figure1.keys(), figure2.keys(), pair_points, match_by_shape))
+        self.nodes_explored = 0
+        for pair_list in iter_possible_permutation(figure1, figure2):
+            self.nodes_explored += 1
             similarity_points = 0
-            shape_match_list = []
 
             for pair in pair_list:
-                f1 = figure1.get(pair[0])
-                f2 = figure2.get(pair[1])
-
                 # Match by shape, then weight attributes. Reject if shape doesn't match
+                if pair[1] is None:
+                    if match_by_shape:
+                        break
+                    continue
+                points = pair_points.get(pair)
+                if points is None:
+                    # if shape is not match, then break
+                    break
+                similarity_points += points
+
+            best_match.add(similarity_points, pair_list)
+            if best_match.done or (self.nodes_explored % DEADLINE_INTERVAL == 0 and self.is_past_deadline()):
+                break
+
+        pair_list = best_match.item
+        for pair in pair_list:
+            relationship_map[pair[0]] = pair[1]
+
+        return relationship_map
+
+    def map_identity_branch_and_bound(self, figure1, figure2, by_shape=True, seed=None):
+        """
+        Branch-and-bound version of map_identity. Walks the permutations in the same order as
+        iter_possible_permutation, but prunes a partial assignment as soon as its points plus an upper bound
+        for the remaining pairs cannot beat the best assignment found so far. Returns the same relationship
+        map as the exhaustive search (ties go to the first permutation).
+
+        A seed mapping is completed into an assignment whose points are a lower bound of the best points, so
+        from the start the search can prune the assignments that cannot reach them.
+
+        :param figure1:
+        :param figure2:
+        :param by_shape:
+        :param seed: {figure1 object: figure2 object}, possibly partial
+        :return:
+        """
+        src_objects = figure1.keys()
+        dest_objects = figure2.keys()
+
+        object_name_set = self.get_features(figure1).object_names | self.get_features(figure2).object_names
+        name_mask = self.vocabulary.get_value_mask(object_name_set)
+        compact_figure1 = self.get_compact_figure(figure1)
+        compact_figure2 = self.get_compact_figure(figure2)
+
+        match_by_shape = self.get_match_by_shape(figure1, figure2, by_shape)
+
+        # Same tree as iter_possible_permutation: each object of the smaller figure (a position) is given an
+        # object of the larger figure (a candidate), in order
+        src_is_candidate = len(src_objects) >= len(dest_objects)
+        if src_is_candidate:
+            positions, candidates = dest_objects, src_objects
+        else:
+            positions, candidates = src_objects, dest_objects
+
+        # Score every (position, candidate) pair once. None marks a shape mismatch, which ends the scoring of
+        # an assignment when matching by shape
+        depth = len(positions)
+        points_table = []
+        for position_name in positions:
+            row = []
+            for candidate_name in candidates:
+                if src_is_candidate:
+                    f1, f2 = compact_figure1.get(candidate_name), compact_figure2.get(position_name)
+                else:
+                    f1, f2 = compact_figure1.get(position_name), compact_figure2.get(candidate_name)
                 if match_by_shape:
-                    # Match by shape. Only care about the network from and to the same shape
-                    if set(f1.get('shape')) == (f2 and set(f2.get('shape'))):
-                        similarity_points += self.get_similarity_points(f1, f2, object_name_set, match_by_shape)
+                    if self.is_shape_equal(f1, f2):
+                        row.append(self.get_compact_similarity_points(f1, f2, name_mask, match_by_shape))
                     else:
-                        # if shape is not match, then break
-                        break
+                        row.append(None)
+                else:
+                    row.append(self.get_compact_similarity_points(f1, f2, name_mask))
+            points_table.append(row)
+
+        # upper_bound[i] is the most points the pairs from position i onward can add
+        upper_bound = [0] * (depth + 1)
+        for i in reversed(range(depth)):
+            points = [p for p in points_table[i] if p is not None]
+            best_points = max(points) if len(points) else 0
+            if match_by_shape:
+                best_points = max(best_points, 0)
+            upper_bound[i] = upper_bound[i + 1] + best_points
+
+        seed_points = None
+        if seed:
+            seed_points = self.get_seed_points(seed, positions, candidates, src_is_candidate, points_table)
+
+        used = [False] * len(candidates)
+        order = []
+        # an assignment that gets upper_bound[0] points ends the search
+        best = ArgMax(upper_bound[0])
+        self.nodes_explored = 0
+
+        def update_best(similarity_points):
+            if best.beats(similarity_points):
+                # the remaining objects follow in their original order, as in the first matching permutation
+                best.add(similarity_points, order + [c for c in range(len(candidates)) if c not in order])
+
+        def search(position, similarity_points):
+            self.nodes_explored += 1
+            if self.nodes_explored % DEADLINE_INTERVAL == 0:
+                self.is_past_deadline()
+            if position == depth:
+                update_best(similarity_points)
+                return
+
+            for c in range(len(candidates)):
+                if used[c]:
+                    continue
+                points = points_table[position][c]
+                order.append(c)
+                if points is None:
+                    # shape mismatch, the rest of the assignment does not add any points
+                    self.nodes_explored += 1
+                    update_best(similarity_points)
+                elif best.beats(similarity_points + points + upper_bound[position + 1]) and \
+                        (seed_points is None or similarity_points + points + upper_bound[position + 1] >= seed_points):
+                    used[c] = True
+                    search(position + 1, similarity_points + points)
+                    used[c] = False
+                order.pop()
+                if best.done or not self.exact:
+                    return
+
+        search(0, 0)
+        if best.item is None:
+            # the deadline passed before any assignment was complete, take the first one
+            best.add(0, range(len(candidates)))
+
+        relationship_map = {
+            'matchShape': match_by_shape
+        }
+        if src_is_candidate:
+            for index, c in enumerate(best.item):
+                relationship_map[src_objects[c]] = dest_objects[index] if len(dest_objects) > index else None
+        else:
+            for index, src_name in enumerate(src_objects):
+                relationship_map[src_name] = dest_objects[best.item[index]]
+
+        return relationship_map
 
-                    shape_match_list.append(True)
-                elif not match_by_shape:
-                    if f2 is not None:
-                        similarity_points += self.get_similarity_points(f1, f2, object_name_set)
+    def get_seed_points(self, seed, positions, candidates, src_is_candidate, points_table):
+        """
+        Method to get the points of the assignment of map_identity_branch_and_bound given by a seed mapping. The
+        positions without a seeded candidate get the remaining candidates in order, and as in the search the points
+        stop at the first shape mismatch
+
+        :param seed: {figure1 object: figure2 object}, possibly partial
+        :param positions:
+        :param candidates:
+        :param src_is_candidate:
+        :param points_table:
+        :return:
+        """
+        if src_is_candidate:
+            seed = dict((dest_name, src_name) for src_name, dest_name in seed.iteritems())
+        candidate_index = dict((name, c) for c, name in enumerate(candidates))
 
-            matches_list.append({'similarityPoints': similarity_points, 'pairList': pair_list})
+        order = []
+        for position_name in positions:
+            c = candidate_index.get(seed.get(position_name))
+            order.append(c if c not in order else None)
+        remaining = [c for c in range(len(candidates)) if c not in order]
+        order = [c if c is not None else remaining.pop(0) for c in order]
 
-        matches_list = sorted(matches_list, key=lambda x: x.get('similarityPoints'), reverse=True)
-        match = matches_list[0]
+        similarity_points = 0
+        for position, c in enumerate(order):
+            points = points_table[position][c]
+            if points is None:
+                break
+            similarity_points += points
+        return similarity_points
+
+    def map_identity_assignment(self, figure1, figure2, by_shape=True, seed=None):
+        """
+        Assignment version of map_identity. Scores every object pair once and solves the correspondence with
+        the Hungarian algorithm in O(n^3) instead of enumerating permutations. The total points are additive,
+        so a shape mismatch is avoided whenever possible instead of ending the scoring of the assignment.
 
-        pair_list = match.get('pairList')
+        :param figure1:
+        :param figure2:
+        :param by_shape:
+        :param seed: not used, the assignment is solved directly
+        :return:
+        """
+        object_name_set = self.get_features(figure1).object_names | self.get_features(figure2).object_names
+        name_mask = self.vocabulary.get_value_mask(object_name_set)
+        compact_figure1 = self.get_compact_figure(figure1)
+        compact_figure2 = self.get_compact_figure(figure2)
+
+        match_by_shape = self.get_match_by_shape(figure1, figure2, by_shape)
+
+        def get_points(src_name, dest_name):
+            f1 = compact_figure1.get(src_name)
+            f2 = compact_figure2.get(dest_name)
+            if match_by_shape:
+                if self.is_shape_equal(f1, f2):
+                    return self.get_compact_similarity_points(f1, f2, name_mask, match_by_shape)
+                # shape mismatch, only assigned if there is no other choice
+                return None
+            return self.get_compact_similarity_points(f1, f2, name_mask)
+
+        pair_list, similarity_points = self.get_assignment_pairs(figure1.keys(), figure2.keys(), get_points)
+        self.nodes_explored = len(figure1) * len(figure2)
+
+        relationship_map = {
+            'matchShape': match_by_shape
+        }
         for pair in pair_list:
             relationship_map[pair[0]] = pair[1]
 
         return relationship_map
 
+    def get_assignment_pairs(self, src_objects, dest_objects, get_points):
+        """
+        Method to find the src -> dest object pairs with the most points using the assignment solver.
+        The points matrix is built once and padded with dummy rows and columns when the object counts differ:
+        a src object assigned to a dummy column is deleted (paired with None), a dest object assigned to a
+        dummy row is added and left out of the pairs.
+
+        :param src_objects:
+        :param dest_objects:
+        :param get_points: function(src_name, dest_name) returning the points, or None if the pair is rejected
+        :return: (pair list, total points)
+        """
+        size = max(len(src_objects), len(dest_objects))
+        points_matrix = [[0] * size for i in range(size)]
+        rejected = []
+        for i, src_name in enumerate(src_objects):
+            for j, dest_name in enumerate(dest_objects):
+                points = get_points(src_name, dest_name)
+                if points is None:
+                    rejected.append((i, j))
+                else:
+                    points_matrix[i][j] = points
+
+        # a rejected pair costs more than any other assignment could gain
+        penalty = 2 * sum(abs(points) for row in points_matrix for points in row) + 1
+        for i, j in rejected:
+            points_matrix[i][j] = -penalty
+
+        assignment = get_optimal_assignment(points_matrix)
+
+        pair_list = []
+        similarity_points = 0
+        for i, src_name in enumerate(src_objects):
+            j = assignment[i]
+            if j < len(dest_objects):
+                pair_list.append((src_name, dest_objects[j]))
+                if (i, j) not in rejected:
+                    similarity_points += points_matrix[i][j]
+            else:
+                pair_list.append((src_name, None))
+
+        return pair_list, similarity_points
+
+    def get_match_by_shape(self, figure1, figure2, by_shape=True):
+        """
+        Method to check if two figures should be matched by shape, i.e. the shapes in one figure are a subset
+        of the shapes in the other
+
+        :param figure1:
+        :param figure2:
+        :param by_shape:
+        :return:
+        """
+        shapes_figure1 = self.get_features(figure1).shape_set
+        shapes_figure2 = self.get_features(figure2).shape_set
+
+        if shapes_figure1 <= shapes_figure2 or shapes_figure1 >= shapes_figure2:
+            return True and by_shape
+        return False
+
+    def is_shape_equal(self, c1, c2):
+        """
+        Method to check if two compact objects have the same shape. A missing or empty object never matches
+
+        :param c1:
+        :param c2:
+        :return:
+        """
+        shape_id = self.vocabulary.get_attribute_id('shape')
+        return c2 is not None and len(c2) > 0 and c1.masks.get(shape_id) == c2.masks.get(shape_id)
+
     def get_similarity_points(self, f1, f2, object_name_set, by_shape=False):
         """
-        Method to calculate the similarity points
+        Method to get the similarity points of two object dictionaries
 
         :param f1:
         :param f2:
@@ -509,52 +1335,75 @@ class Agent:
         :param by_shape:
         :return similarity_point:
         """
-        src_attrs = f1.keys()
-        if 'shape' in src_attrs:
-            src_attrs.remove('shape')
-        dest_attrs = f2.keys()
-        if 'shape' in dest_attrs:
-            dest_attrs.remove('shape')
+        return self.get_compact_similarity_points(self.vocabulary.get_compact_object(f1),
+                                                  self.vocabulary.get_compact_object(f2),
+                                                  self.vocabulary.get_value_mask(object_name_set), by_shape)
+
+    def get_compact_similarity_points(self, c1, c2, name_mask, by_shape=False):
+        """
+        Method to get the similarity points of two compact objects, looked up in the similarity cache before they
+        are calculated
+
+        :param c1:
+        :param c2:
+        :param name_mask:
+        :param by_shape:
+        :return similarity_point:
+        """
+        key = (c1.signature, c2.signature, name_mask, bool(by_shape))
+        similarity_points = self.similarity_cache.get(key)
+        if similarity_points is None:
+            similarity_points = self.calculate_similarity_points(c1, c2, name_mask, by_shape)
+            self.similarity_cache.put(key, similarity_points)
+        return similarity_points
+
+    def calculate_similarity_points(self, c1, c2, name_mask, by_shape=False):
+        """
+        Method to calculate the similarity points of two compact objects. An attribute whose values are all
+        object names is a position attribute such as inside, left-of, above, etc
+
+        :param c1:
+        :param c2:
+        :param name_mask: value mask of the object names in both figures
+        :param by_shape:
+        :return similarity_point:
+        """
+        shape_id = self.vocabulary.get_attribute_id('shape')
+        src_masks = c1.masks
+        dest_masks = c2.masks
 
         attr_counter = 0
 
         # if match by shape
-        if by_shape and f1.get('shape') is not None and f2.get('shape') is not None:
-            if set(f1.get('shape')) == set(f2.get('shape')):
+        if by_shape and src_masks.get(shape_id) is not None and dest_masks.get(shape_id) is not None:
+            if src_masks.get(shape_id) == dest_masks.get(shape_id):
                 attr_counter += 1
 
         # if f2 is empty figure (delete transition), assign less weight
-        if len(f2) == 0:
+        if len(dest_masks) == 0:
             attr_counter -= 1
 
-        pos_list = []
-        pos_map = {}
-        for src_attr in src_attrs:
-            if src_attr in dest_attrs:
-                dest_attrs.remove(src_attr)
-                if set(f1.get(src_attr)) == set(f2.get(src_attr)):
-                    if set(f1.get(src_attr)) <= object_name_set:
+        for src_attr, src_mask in src_masks.iteritems():
+            if src_attr == shape_id:
+                continue
+            if src_attr in dest_masks:
+                if src_mask == dest_masks.get(src_attr):
+                    if src_mask & ~name_mask == 0:
                         # assign higher weight if position unchanged
                         attr_counter += 1
                     attr_counter += 1
                 else:
                     if by_shape:
                         attr_counter += 0.5
-            else:
-                # check if this is position attr such as inside, left-of, above, etc
-                if set(f1.get(src_attr)) <= object_name_set:
-                    pos_list.append(src_attr)
-                    self.assign_position(src_attr, f1, pos_map, 'from')
-                else:
-                    # if attr(src) not in dest_attrs, and if not position attr, it means we are deleting the attr
-                    # reduce similarity point
-                    attr_counter -= 1
-
-        for dest_attr in dest_attrs:
-            if f2.get(dest_attr) is not None and set(f2.get(dest_attr)) <= object_name_set:
-                pos_list.append(dest_attr)
-                self.assign_position(dest_attr, f2, pos_map, 'to')
-            else:
+            elif src_mask & ~name_mask:
+                # if attr(src) not in dest_attrs, and if not position attr, it means we are deleting the attr
+                # reduce similarity point
+                attr_counter -= 1
+
+        for dest_attr, dest_mask in dest_masks.iteritems():
+            if dest_attr == shape_id or dest_attr in src_masks:
+                continue
+            if dest_mask is None or dest_mask & ~name_mask:
                 # if not position attr, adding new attr
                 # reduce similarity point
                 attr_counter -= 1
@@ -582,22 +1431,95 @@ def get_possible_permutation(src_figure, dest_figure):
     :return:
     """
 
-    src_objects = src_figure.keys()
-    dest_objects = dest_figure.keys()
+    return [list(pair_list) for pair_list in iter_possible_permutation(src_figure, dest_figure)]
 
-    src_lists = permutations(range(len(src_objects)))
-    dest_lists = combinations(range(len(dest_objects)), len(dest_objects))
+def iter_possible_permutation(src_figure, dest_figure):
+    """
+    Generator version of get_possible_permutation. Yields one pair tuple at a time so the caller can score the
+    permutations as they come, or stop early, without holding every permutation in memory.
+    Every src -> dest injection is yielded exactly once, src objects without a dest are paired with None
+    i.e. shapes_a = ['Z', 'Y', 'X'], shapes_b = ['Z', 'Y']
+    yields (('Z', 'Z'), ('Y', 'Y'), ('X', None)), (('Z', 'Z'), ('X', 'Y'), ('Y', None)), ...
 
-    results = []
+    :param src_figure:
+    :param dest_figure:
+    :return:
+    """
+    src_objects = src_figure.keys()
+    dest_objects = dest_figure.keys()
 
-    for dest_list in dest_lists:
-        for src_list in src_lists:
-            inner_list = []
-            for index, s in enumerate(src_list):
-                inner_list.append((src_objects[s], dest_objects[dest_list[index]] if len(dest_list) > index else None))
-            results.append(inner_list)
+    if len(src_objects) >= len(dest_objects):
+        # every ordered choice of src objects for the dest objects, the src objects left over are deleted
+        num_deleted = len(src_objects) - len(dest_objects)
+        dest_list = tuple(dest_objects) + (None,) * num_deleted
+        for src_list in permutations(src_objects, len(dest_objects)):
+            if num_deleted:
+                src_list += tuple([s for s in src_objects if s not in src_list])
+            yield tuple(zip(src_list, dest_list))
+    else:
+        # every ordered choice of dest objects for the src objects, the dest objects left over are added
+        for dest_list in permutations(dest_objects, len(src_objects)):
+            yield tuple(zip(src_objects, dest_list))
+
+def get_optimal_assignment(points_matrix):
+    """
+    Solve the assignment problem for a square points matrix with the Hungarian algorithm in O(n^3),
+    maximizing the total points
+    i.e. points_matrix = [[1, 3], [2, 1]], the best assignment is row 0 -> column 1 and row 1 -> column 0
+    [1, 0]
 
-    return results
+    :param points_matrix:
+    :return: list of the assigned column for each row
+    """
+    size = len(points_matrix)
+    infinity = float('inf')
+
+    # potentials and matching are 1-indexed, index 0 is the virtual starting column
+    row_potential = [0] * (size + 1)
+    col_potential = [0] * (size + 1)
+    col_match = [0] * (size + 1)
+    way = [0] * (size + 1)
+
+    for row in range(1, size + 1):
+        col_match[0] = row
+        col = 0
+        min_slack = [infinity] * (size + 1)
+        used = [False] * (size + 1)
+        while True:
+            used[col] = True
+            matched_row = col_match[col]
+            delta = infinity
+            next_col = 0
+            for j in range(1, size + 1):
+                if not used[j]:
+                    # minimize the negated points
+                    slack = -points_matrix[matched_row - 1][j - 1] - row_potential[matched_row] - col_potential[j]
+                    if slack < min_slack[j]:
+                        min_slack[j] = slack
+                        way[j] = col
+                    if min_slack[j] < delta:
+                        delta = min_slack[j]
+                        next_col = j
+            for j in range(size + 1):
+                if used[j]:
+                    row_potential[col_match[j]] += delta
+                    col_potential[j] -= delta
+                else:
+                    min_slack[j] -= delta
+            col = next_col
+            if col_match[col] == 0:
+                break
+        # augment along the alternating path
+        while col:
+            prev_col = way[col]
+            col_match[col] = col_match[prev_col]
+            col = prev_col
+
+    assignment = [0] * size
+    for col in range(1, size + 1):
+        assignment[col_match[col] - 1] = col - 1
+
+    return assignment
 
 class Util:
     def __init__(self):
@@ -625,7 +1547,7 @@ class Util:
                     else:
                         attrs[attr.getName()] = [attr.getValue()]
                 items[object.getName()] = attrs
-            figures[name] = items
+            figures[name] = Figure(items)
 
         py_problem['figures'] = figures
         py_problem['name'] = problem.getName()
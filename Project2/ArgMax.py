@@ -0,0 +1,74 @@
+# Streaming selection of the item with the highest score, for the searches of the agent
+# that only use the best item and the items tied with it, instead of sorting every item
+# they score.
+#
+# Items are added one at a time with their score. Of the items with the highest score
+# the one with the lowest rank wins, and the rank defaults to the order the items are
+# added in, so without ranks the first item wins. When the highest score an item can get
+# is known, done becomes True as soon as an added item reaches it: no later item can then
+# beat it, so the caller can stop enumerating items.
+
+class ArgMax:
+    # Creates a new selection with no items.
+    #
+    # @param max_score the highest score an item can get, None if unknown
+    # @param keep_ties keep every item with the highest score, not only the winner
+    def __init__(self, max_score=None, keep_ties=False):
+        self.max_score = max_score
+        self.keep_ties = keep_ties
+        self.score = None
+        self.item = None
+        self.rank = None
+        # (rank, item) of the items tied with the best score
+        self.ties = []
+        self.count = 0
+        self.done = False
+
+    def beats(self, score, rank=None):
+        """
+        Method to check if an item with a score would be the new best, e.g. to skip an item whose score can only be
+        bounded without computing it
+
+        :param score:
+        :param rank: defaults to the rank of the next added item
+        :return:
+        """
+        if self.score is None or score > self.score:
+            return True
+        if score < self.score:
+            return False
+        return (rank if rank is not None else self.count) < self.rank
+
+    def add(self, score, item, rank=None):
+        """
+        Method to add a scored item. Items added with explicit ranks should come in rank order for done to be exact
+
+        :param score:
+        :param item:
+        :param rank: defaults to the number of items added before
+        :return: True if the item is the new best
+        """
+        if rank is None:
+            rank = self.count
+        self.count += 1
+
+        if self.keep_ties and self.score is not None and score == self.score:
+            self.ties.append((rank, item))
+        if not self.beats(score, rank):
+            return False
+
+        if self.keep_ties and (self.score is None or score > self.score):
+            self.ties = [(rank, item)]
+        self.score = score
+        self.item = item
+        self.rank = rank
+        self.done = self.max_score is not None and score >= self.max_score
+        return True
+
+    def get_ties(self):
+        """
+        Method to get the items with the highest score in rank order, the winner first
+
+        :return:
+        """
+        return [item for rank, item in sorted(self.ties, key=lambda tie: tie[0])]
@@ -0,0 +1,493 @@
+# Benchmarks for the Agent. Run from the Project2 folder, i.e.
+#
+#   python Benchmark.py permutations
+#   python Benchmark.py memory
+#   python Benchmark.py loading
+#   python Benchmark.py corpus --output bench.json --baseline baseline.json
+#   python Benchmark.py scoring --path Problems --path Synthetic
+#   python Benchmark.py batch --path Problems --path Synthetic
+#
+# Each benchmark prints a table to stdout. The corpus benchmark can also save its
+# results as JSON and compare them against a saved baseline, exiting with status 1
+# when a metric got worse by more than the tolerance. Synthetic sets written by
+# ProblemGenerator.py are included by passing their parent folder, i.e.
+#
+#   python ProblemGenerator.py --output "Synthetic/2x1 Synthetic Problems" --objects 8
+#   python Benchmark.py corpus --path Problems --path Synthetic
+from __future__ import print_function
+from itertools import permutations, combinations
+import argparse
+import gc
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+from Agent import Agent, iter_possible_permutation
+from PackedCorpus import PackedCorpus, pack_corpus
+from ProblemCache import ProblemCache
+from CompactRavens import compact_problem
+from ProblemLoader import iter_problems
+from ProblemSet import ProblemSet
+import VectorScoring
+
+# Object names are assigned starting with the letter Z and proceeding backwards in the alphabet
+OBJECT_NAMES = 'ZYXWVUTSRQPONMLKJIHGFEDCBA'
+
+
+def create_figure(num_objects):
+    """
+    Method to create a figure dictionary with the given number of objects
+
+    :param num_objects:
+    :return:
+    """
+    return dict((name, {'shape': ['circle']}) for name in OBJECT_NAMES[:num_objects])
+
+
+def legacy_possible_permutation(src_figure, dest_figure):
+    """
+    The enumeration get_possible_permutation used before the combinations() fix, kept to compare against.
+    Only src orderings are explored, so dest objects past the number of src objects are never paired.
+
+    :param src_figure:
+    :param dest_figure:
+    :return:
+    """
+    src_objects = src_figure.keys()
+    dest_objects = dest_figure.keys()
+
+    src_lists = permutations(range(len(src_objects)))
+    dest_lists = combinations(range(len(dest_objects)), len(dest_objects))
+
+    for dest_list in dest_lists:
+        for src_list in src_lists:
+            inner_list = []
+            for index, s in enumerate(src_list):
+                inner_list.append((src_objects[s], dest_objects[dest_list[index]] if len(dest_list) > index else None))
+            yield inner_list
+
+
+def time_enumeration(enumerate_pairs, src_figure, dest_figure):
+    """
+    Method to count the candidates of an enumeration and time a full pass over them
+
+    :param enumerate_pairs:
+    :param src_figure:
+    :param dest_figure:
+    :return: (candidate count, seconds)
+    """
+    start = time.time()
+    count = 0
+    for pair_list in enumerate_pairs(src_figure, dest_figure):
+        count += 1
+    return count, time.time() - start
+
+
+def benchmark_permutations(args):
+    """
+    Compare candidate counts and wall time of the legacy and the corrected permutation enumeration for
+    figures of 1 to max_objects objects, with equal counts, one deleted object and one added object
+
+    :param args:
+    :return:
+    """
+    print('%-8s %-8s %12s %10s %12s %10s' % ('src', 'dest', 'legacy', 'time(s)', 'corrected', 'time(s)'))
+    for num_objects in range(1, args.max_objects + 1):
+        for num_src, num_dest in [(num_objects, num_objects), (num_objects, num_objects - 1),
+                                  (num_objects - 1, num_objects)]:
+            if num_src < 0 or num_dest < 0:
+                continue
+            src_figure = create_figure(num_src)
+            dest_figure = create_figure(num_dest)
+            legacy_count, legacy_time = time_enumeration(legacy_possible_permutation, src_figure, dest_figure)
+            count, seconds = time_enumeration(iter_possible_permutation, src_figure, dest_figure)
+            print('%-8d %-8d %12d %10.4f %12d %10.4f' % (num_src, num_dest, legacy_count, legacy_time,
+                                                          count, seconds))
+
+
+def load_problems(path):
+    """
+    Method to load every problem file under the problem set folders of path
+
+    :param path:
+    :return: list of RavensProblem
+    """
+    return [problem for set_name, problem in iter_problems(path)]
+
+
+def get_deep_size(obj):
+    """
+    Method to get the size in bytes of an object and everything it references, counting shared objects once
+
+    :param obj:
+    :return:
+    """
+    seen = set()
+    size = 0
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen or isinstance(current, type):
+            continue
+        seen.add(id(current))
+        size += sys.getsizeof(current)
+        stack.extend(gc.get_referents(current))
+    return size
+
+
+def benchmark_memory(args):
+    """
+    Compare the memory held by the problems under the Problems folder, loaded copies times, with the
+    RavensFigure classes and with the CompactRavensFigure classes
+
+    :param args:
+    :return:
+    """
+    problems = []
+    for copy in range(args.copies):
+        problems += load_problems(args.path)
+
+    start = time.time()
+    compact_problems = [compact_problem(problem) for problem in problems]
+    convert_time = time.time() - start
+
+    # only count the figures, the RavensProblem wrappers are the same in both
+    size = get_deep_size([problem.getFigures() for problem in problems])
+    compact_size = get_deep_size([problem.getFigures() for problem in compact_problems])
+
+    print('%-16s %10s %14s %14s' % ('figures', 'problems', 'bytes', 'bytes/problem'))
+    print('%-16s %10d %14d %14.1f' % ('RavensFigure', len(problems), size, size / float(len(problems))))
+    print('%-16s %10d %14d %14.1f' % ('CompactRavens', len(compact_problems), compact_size,
+                                      compact_size / float(len(compact_problems))))
+    print('conversion time: %.4fs' % convert_time)
+
+
+def benchmark_loading(args):
+    """
+    Compare the time to load the problems under the Problems folder, repeat times, with ProblemSet.addProblem,
+    with the ProblemLoader, with the ProblemLoader and a new ProblemCache, with the ProblemLoader and a ProblemCache
+    saved by an earlier run, and from a PackedCorpus, decoding every figure. Every row is the time of repeat runs
+
+    :param args:
+    :return:
+    """
+    start = time.time()
+    for repeat in range(args.repeat):
+        for set_name in os.listdir(args.path):
+            problem_set = ProblemSet(set_name)
+            for file_name in os.listdir(os.path.join(args.path, set_name)):
+                with open(os.path.join(args.path, set_name, file_name)) as problem_file:
+                    problem_set.addProblem(problem_file)
+    add_problem_time = time.time() - start
+
+    timings = [('addProblem', add_problem_time)]
+    for compact in [False, True]:
+        start = time.time()
+        for repeat in range(args.repeat):
+            for set_name, problem in iter_problems(args.path, compact):
+                pass
+        timings.append(('loader' + (' (compact)' if compact else ''), time.time() - start))
+
+    cache_dir = tempfile.mkdtemp()
+    try:
+        cache_path = os.path.join(cache_dir, 'problem_cache')
+        start = time.time()
+        for repeat in range(args.repeat):
+            # every first run starts without a cache file, the last one leaves it for the runs below
+            if os.path.exists(cache_path):
+                os.remove(cache_path)
+            cache = ProblemCache(cache_path)
+            for set_name, problem in iter_problems(args.path, cache=cache):
+                pass
+            cache.save()
+        timings.append(('cache (first run)', time.time() - start))
+
+        start = time.time()
+        for repeat in range(args.repeat):
+            cache = ProblemCache(cache_path)
+            for set_name, problem in iter_problems(args.path, cache=cache):
+                pass
+        timings.append(('cache', time.time() - start))
+
+        packed_path = os.path.join(cache_dir, 'problems.pack')
+        pack_corpus(args.path, packed_path)
+        start = time.time()
+        for repeat in range(args.repeat):
+            corpus = PackedCorpus(packed_path)
+            for set_name, problem in corpus.iter_problems():
+                problem.getFigures()
+            corpus.close()
+        timings.append(('packed', time.time() - start))
+    finally:
+        shutil.rmtree(cache_dir)
+
+    print('%-20s %10s' % ('method', 'time(s)'))
+    for method, seconds in timings:
+        print('%-20s %10.4f' % (method, seconds))
+
+
+def get_percentile(values, percent):
+    """
+    Method to get the nearest-rank percentile of a list of values
+
+    :param values:
+    :param percent:
+    :return:
+    """
+    ordered = sorted(values)
+    rank = max(int(-(-percent * len(ordered) // 100)), 1)
+    return ordered[rank - 1]
+
+
+def benchmark_corpus(args):
+    """
+    Solve every problem under the given paths repeat times, each time with a new Agent, and report problems per
+    second, latency percentiles and accuracy per problem type, and peak memory. With a budget every problem is
+    solved with a deadline, and the answers it cut short are counted as truncated
+
+    :param args:
+    :return: 1 if a metric regressed against the baseline, None otherwise
+    """
+    problems = []
+    for path in args.path or ['Problems']:
+        problems += load_problems(path)
+
+    latencies = {}
+    correct = {}
+    truncated = {}
+    start = time.time()
+    for repeat in range(args.repeat):
+        agent = Agent()
+        agent.mapping_method = args.mapping_method
+        for problem in problems:
+            problem_start = time.time()
+            answer = agent.Solve(problem, problem_start + args.budget if args.budget is not None else None)
+            latencies.setdefault(problem.getProblemType(), []).append(time.time() - problem_start)
+            if repeat == 0:
+                correct.setdefault(problem.getProblemType(), []).append(answer == problem.correctAnswer)
+                truncated.setdefault(problem.getProblemType(), []).append(not agent.exact)
+    total_time = time.time() - start
+
+    results = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'mapping_method': args.mapping_method,
+        'budget': args.budget,
+        'repeat': args.repeat,
+        'problems': len(problems),
+        'problems_per_second': len(problems) * args.repeat / total_time if total_time else 0.0,
+        'peak_memory_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'types': {}
+    }
+    for problem_type, values in latencies.iteritems():
+        results['types'][problem_type] = {
+            'count': len(correct.get(problem_type)),
+            'accuracy': sum(correct.get(problem_type)) / float(len(correct.get(problem_type))),
+            'truncated': sum(truncated.get(problem_type)),
+            'p50': get_percentile(values, 50),
+            'p95': get_percentile(values, 95),
+            'p99': get_percentile(values, 99)
+        }
+
+    print('%-6s %8s %10s %10s %12s %12s %12s' % ('type', 'count', 'accuracy', 'truncated', 'p50(ms)', 'p95(ms)',
+                                                 'p99(ms)'))
+    for problem_type in sorted(results.get('types')):
+        stats = results.get('types').get(problem_type)
+        print('%-6s %8d %10.3f %10d %12.3f %12.3f %12.3f' % (problem_type, stats.get('count'), stats.get('accuracy'),
+                                                              stats.get('truncated'), stats.get('p50') * 1000,
+                                                              stats.get('p95') * 1000, stats.get('p99') * 1000))
+    print('problems/sec: %.1f' % results.get('problems_per_second'))
+    print('peak memory: %d KB' % results.get('peak_memory_kb'))
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        if compare_results(baseline, results, args.tolerance):
+            return 1
+
+
+def compare_results(baseline, results, tolerance):
+    """
+    Method to print the change of every corpus benchmark metric against a baseline
+
+    :param baseline:
+    :param results:
+    :param tolerance: allowed relative change in the bad direction, i.e. 0.1 for 10%
+    :return: list of the metrics that regressed
+    """
+    # (metric name, baseline value, current value, True if higher is better)
+    metrics = [('problems_per_second', baseline.get('problems_per_second'), results.get('problems_per_second'), True),
+               ('peak_memory_kb', baseline.get('peak_memory_kb'), results.get('peak_memory_kb'), False)]
+    for problem_type in sorted(results.get('types')):
+        stats = results.get('types').get(problem_type)
+        baseline_stats = baseline.get('types').get(problem_type)
+        if baseline_stats is None:
+            continue
+        metrics.append((problem_type + ' accuracy', baseline_stats.get('accuracy'), stats.get('accuracy'), True))
+        for percentile in ['p50', 'p95', 'p99']:
+            metrics.append((problem_type + ' ' + percentile, baseline_stats.get(percentile), stats.get(percentile),
+                            False))
+
+    regressions = []
+    print('%-24s %14s %14s %10s' % ('metric', 'baseline', 'current', 'change'))
+    for name, before, after, higher_is_better in metrics:
+        change = (after - before) / float(before) if before else 0.0
+        worse = -change if higher_is_better else change
+        regressed = worse > tolerance
+        if regressed:
+            regressions.append(name)
+        print('%-24s %14.6g %14.6g %9.1f%% %s' % (name, before, after, change * 100, 'REGRESSION' if regressed else ''))
+
+    return regressions
+
+
+def benchmark_scoring(args):
+    """
+    Solve every problem under the given paths with vector scoring and score every group of options the agent scores
+    together, see Agent.get_scoring_groups, both one by one and with VectorScoring, checking that both give the
+    same weights and comparing their time
+
+    :param args:
+    :return: 1 if numpy is not installed or a weight differs, None otherwise
+    """
+    if VectorScoring.numpy is None:
+        print('numpy is not installed')
+        return 1
+
+    problems = []
+    for path in args.path or ['Problems']:
+        problems += load_problems(path)
+
+    agent = Agent()
+    agent.mapping_method = args.mapping_method
+    agent.scoring_method = 'vector'
+    # per number of options: [option sets, mismatches, scalar time, vector time]
+    stats = {}
+
+    def compare_scoring(candidates, by_shape=False):
+        start = time.time()
+        for repeat in range(args.repeat):
+            weights = [agent.match_figures_new(option, guess, cd_map, by_shape).get('weight')
+                       for option, guess, cd_map in candidates]
+        scalar_time = time.time() - start
+
+        start = time.time()
+        for repeat in range(args.repeat):
+            compact_candidates = [agent.get_compact_pair(option, guess) for option, guess, cd_map in candidates]
+            vector_weights = VectorScoring.score_options(agent.vector_encoder, compact_candidates, by_shape)
+        vector_time = time.time() - start
+
+        stat = stats.setdefault(len(candidates), [0, 0, 0.0, 0.0])
+        stat[0] += 1
+        stat[1] += weights != vector_weights
+        stat[2] += scalar_time
+        stat[3] += vector_time
+        return weights
+
+    agent.score_options = compare_scoring
+    for problem in problems:
+        agent.Solve(problem)
+
+    print('%-8s %8s %10s %12s %12s %8s' % ('options', 'sets', 'mismatch', 'scalar(s)', 'vector(s)', 'speedup'))
+    for num_options in sorted(stats):
+        sets, mismatches, scalar_time, vector_time = stats.get(num_options)
+        print('%-8d %8d %10d %12.4f %12.4f %8.2f' % (num_options, sets, mismatches, scalar_time, vector_time,
+                                                     scalar_time / vector_time if vector_time else 0.0))
+
+    if sum(stat[1] for stat in stats.values()):
+        return 1
+
+
+def benchmark_batch(args):
+    """
+    Solve every problem under the given paths repeat times, each time with a new Agent, both one by one with Solve
+    and in one batch with solve_many, checking that both give the same answers and comparing their time
+
+    :param args:
+    :return: 1 if an answer differs, None otherwise
+    """
+    problems = []
+    for path in args.path or ['Problems']:
+        problems += load_problems(path)
+
+    single_time = 0.0
+    batch_time = 0.0
+    mismatches = 0
+    for repeat in range(args.repeat):
+        agent = Agent()
+        agent.mapping_method = args.mapping_method
+        start = time.time()
+        answers = [agent.Solve(problem) for problem in problems]
+        single_time += time.time() - start
+
+        agent = Agent()
+        agent.mapping_method = args.mapping_method
+        start = time.time()
+        batch_answers = agent.solve_many(problems)
+        batch_time += time.time() - start
+        mismatches += sum(answer != batch_answer for answer, batch_answer in zip(answers, batch_answers))
+
+    print('%-10s %8s %10s %12s %12s' % ('mode', 'problems', 'mismatch', 'time(s)', 'problems/sec'))
+    for mode, mode_time in (('Solve', single_time), ('solve_many', batch_time)):
+        print('%-10s %8d %10d %12.4f %12.1f' % (mode, len(problems), mismatches, mode_time,
+                                                len(problems) * args.repeat / mode_time if mode_time else 0.0))
+
+    if mismatches:
+        return 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Agent benchmarks')
+    subparsers = parser.add_subparsers()
+
+    permutations_parser = subparsers.add_parser('permutations', help='object permutation enumeration')
+    permutations_parser.add_argument('--max-objects', type=int, default=10)
+    permutations_parser.set_defaults(run=benchmark_permutations)
+
+    memory_parser = subparsers.add_parser('memory', help='memory held by the loaded problems')
+    memory_parser.add_argument('--path', default='Problems')
+    memory_parser.add_argument('--copies', type=int, default=1)
+    memory_parser.set_defaults(run=benchmark_memory)
+
+    loading_parser = subparsers.add_parser('loading', help='problem file loading time')
+    loading_parser.add_argument('--path', default='Problems')
+    loading_parser.add_argument('--repeat', type=int, default=10)
+    loading_parser.set_defaults(run=benchmark_loading)
+
+    corpus_parser = subparsers.add_parser('corpus', help='solve throughput, latency and accuracy')
+    corpus_parser.add_argument('--path', action='append', help='problems folder, may be repeated (default Problems)')
+    corpus_parser.add_argument('--repeat', type=int, default=5)
+    corpus_parser.add_argument('--mapping-method', default='exhaustive',
+                               choices=['exhaustive', 'branch_and_bound', 'assignment'])
+    corpus_parser.add_argument('--budget', type=float, help='seconds to solve each problem in, see Agent.Solve')
+    corpus_parser.add_argument('--output', help='save the results as JSON')
+    corpus_parser.add_argument('--baseline', help='JSON results to compare against')
+    corpus_parser.add_argument('--tolerance', type=float, default=0.1)
+    corpus_parser.set_defaults(run=benchmark_corpus)
+
+    scoring_parser = subparsers.add_parser('scoring', help='scalar and vector option scoring equivalence and time')
+    scoring_parser.add_argument('--path', action='append', help='problems folder, may be repeated (default Problems)')
+    scoring_parser.add_argument('--repeat', type=int, default=10)
+    scoring_parser.add_argument('--mapping-method', default='exhaustive',
+                                choices=['exhaustive', 'branch_and_bound', 'assignment'])
+    scoring_parser.set_defaults(run=benchmark_scoring)
+
+    batch_parser = subparsers.add_parser('batch', help='one by one and batch solving equivalence and time')
+    batch_parser.add_argument('--path', action='append', help='problems folder, may be repeated (default Problems)')
+    batch_parser.add_argument('--repeat', type=int, default=5)
+    batch_parser.add_argument('--mapping-method', default='exhaustive',
+                              choices=['exhaustive', 'branch_and_bound', 'assignment'])
+    batch_parser.set_defaults(run=benchmark_batch)
+
+    args = parser.parse_args()
+    sys.exit(args.run(args))
+
+if __name__ == "__main__":
+    main()
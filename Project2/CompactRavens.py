@@ -0,0 +1,81 @@
+# Memory-light variants of RavensAttribute, RavensObject and RavensFigure with the
+# same getter API. The attribute is a tuple, the object and the figure use __slots__
+# and hold their children in tuples, and every name and value string is interned, so
+# loading many problems does not keep a __dict__ and a copy of each string per line
+# of input.
+from collections import namedtuple
+
+from RavensProblem import RavensProblem
+
+try:
+    intern
+except NameError:
+    from sys import intern
+
+
+# A single variable-value pair that describes some element of a CompactRavensObject.
+class CompactRavensAttribute(namedtuple('CompactRavensAttribute', ['name', 'value'])):
+    __slots__ = ()
+
+    def __new__(cls, name, value):
+        return super(CompactRavensAttribute, cls).__new__(cls, intern(name), intern(value))
+
+    def getName(self):
+        return self.name
+
+    def getValue(self):
+        return self.value
+
+# A single object in a CompactRavensFigure, comprised of a tuple of CompactRavensAttributes.
+class CompactRavensObject(object):
+    __slots__ = ('name', 'attributes')
+
+    def __init__(self, name, attributes=()):
+        self.name = intern(name)
+        self.attributes = tuple(attributes)
+
+    def getName(self):
+        return self.name
+
+    def getAttributes(self):
+        return self.attributes
+
+# A single figure in a Raven's Progressive Matrix problem, comprised of a name and a
+# tuple of CompactRavensObjects.
+class CompactRavensFigure(object):
+    __slots__ = ('name', 'objects')
+
+    def __init__(self, name, objects=()):
+        self.name = intern(name)
+        self.objects = tuple(objects)
+
+    def getName(self):
+        return self.name
+
+    def getObjects(self):
+        return self.objects
+
+
+def compact_figure(figure):
+    """
+    Method to convert a RavensFigure into a CompactRavensFigure
+
+    :param figure:
+    :return:
+    """
+    return CompactRavensFigure(figure.getName(), [
+        CompactRavensObject(obj.getName(), [CompactRavensAttribute(attr.getName(), attr.getValue())
+                                            for attr in obj.getAttributes()])
+        for obj in figure.getObjects()])
+
+def compact_problem(problem):
+    """
+    Method to copy a RavensProblem with its figures converted into CompactRavensFigures
+
+    :param problem:
+    :return:
+    """
+    new_problem = RavensProblem(problem.getName(), problem.getProblemType(), problem.correctAnswer)
+    for name, figure in problem.getFigures().iteritems():
+        new_problem.getFigures()[name] = compact_figure(figure)
+    return new_problem
@@ -0,0 +1,188 @@
+# Driver that solves the problems under Problems/ and writes Results.txt in the
+# same format and order as Project2.main, optionally across a pool of worker
+# processes. Each worker process keeps its own Agent.
+#
+#   python Driver.py --workers 8
+#   python Driver.py --profile Profile.json
+#   python Driver.py --cache .problem_cache
+#   python Driver.py --packed Problems.pack
+from __future__ import print_function
+import argparse
+import multiprocessing
+import os
+
+from Agent import Agent
+from PackedCorpus import PackedCorpus
+from ProblemCache import ProblemCache
+from ProblemLoader import build_problem, load_problem
+from Profiler import Profiler
+
+# The Agent of the current worker process, its Profiler if profiling, and the PackedCorpus if solving one,
+# created by init_worker
+agent = None
+profiler = None
+corpus = None
+
+
+def init_worker(mapping_method, profile=False, packed_path=None):
+    """
+    Method to create the Agent of a worker process
+
+    :param mapping_method:
+    :param profile: attach a Profiler to the Agent
+    :param packed_path: PackedCorpus file to map, every worker maps the same pages
+    :return:
+    """
+    global agent, profiler, corpus
+    corpus = PackedCorpus(packed_path) if packed_path is not None else None
+    agent = Agent()
+    agent.mapping_method = mapping_method
+    profiler = None
+    if profile:
+        profiler = Profiler()
+        profiler.attach(agent)
+
+
+def solve_problem(path):
+    """
+    Method to load and solve one problem file with the Agent of the current process
+
+    :param path:
+    :return: see solve
+    """
+    return solve(load_problem(path))
+
+
+def solve_parsed(parsed):
+    """
+    Method to solve one problem already parsed by a ProblemCache with the Agent of the current process
+
+    :param parsed:
+    :return: see solve
+    """
+    return solve(build_problem(parsed))
+
+
+def solve_packed(index):
+    """
+    Method to solve one problem of the PackedCorpus of the current process
+
+    :param index: problem number
+    :return: see solve
+    """
+    return solve(corpus.get_problem(index))
+
+
+def solve(problem):
+    """
+    Method to solve one problem with the Agent of the current process
+
+    :param problem:
+    :return: (the result line of the problem, the profiler record of the problem or None)
+    """
+    problem.setAnswerReceived(agent.Solve(problem))
+
+    result = problem.getName() + ": " + problem.getGivenAnswer() + " " + problem.getCorrect() + \
+        " (Correct Answer: " + problem.checkAnswer("") + ")"
+
+    return result, profiler.records.pop() if profiler is not None else None
+
+
+def list_problem_files(path):
+    """
+    Method to list the problem sets under path, in the same order as Project2.main
+
+    :param path:
+    :return: list of (set name, list of problem file paths)
+    """
+    sets = []
+    for set_name in os.listdir(path):
+        set_path = os.path.join(path, set_name)
+        sets.append((set_name, [os.path.join(set_path, file_name) for file_name in os.listdir(set_path)]))
+    return sets
+
+
+def run(path='Problems', results_path='Results.txt', workers=1, mapping_method='exhaustive', profile_path=None,
+        cache_path=None, packed_path=None):
+    """
+    Method to solve every problem under path and write the results. With more than one worker the problems are
+    solved in a process pool, the results are still written in set and problem order
+
+    :param path:
+    :param results_path:
+    :param workers:
+    :param mapping_method:
+    :param profile_path: if given, profile every problem and write the phase timings there (.json or .csv)
+    :param cache_path: if given, take the unchanged problems from this ProblemCache file instead of parsing them
+    :param packed_path: if given, solve the problems of this PackedCorpus file instead of the files under path
+    :return:
+    """
+    # list of (set name, list of what solve_item takes to solve each problem of the set)
+    if packed_path is not None:
+        sets = PackedCorpus(packed_path).get_sets()
+        solve_item = solve_packed
+    elif cache_path is not None:
+        # the problems are parsed here, once, and the workers only build them
+        cache = ProblemCache(cache_path)
+        cache.prune()
+        sets = [(set_name, [cache.get_parsed(problem_file) for problem_file in files])
+                for set_name, files in list_problem_files(path)]
+        cache.save()
+        solve_item = solve_parsed
+    else:
+        sets = list_problem_files(path)
+        solve_item = solve_problem
+    items = [item for set_name, set_items in sets for item in set_items]
+
+    worker_args = (mapping_method, profile_path is not None, packed_path)
+    pool = None
+    if workers > 1:
+        pool = multiprocessing.Pool(workers, init_worker, worker_args)
+        results_iter = pool.imap(solve_item, items)
+    else:
+        init_worker(*worker_args)
+        results_iter = (solve_item(item) for item in items)
+
+    records = Profiler()
+
+    try:
+        with open(results_path, 'w') as results:
+            for set_name, set_items in sets:
+                results.write("%s\n" % set_name)
+                results.write("%s\n" % "-----------")
+                for item in set_items:
+                    result, record = next(results_iter)
+                    results.write("%s\n" % result)
+                    if record is not None:
+                        records.records.append(record)
+                results.write("\n")
+    except BaseException:
+        if pool is not None:
+            pool.terminate()
+        raise
+
+    if pool is not None:
+        pool.close()
+        pool.join()
+
+    if profile_path is not None:
+        records.write(profile_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Solve the problem sets and write the results')
+    parser.add_argument('--path', default='Problems')
+    parser.add_argument('--results', default='Results.txt')
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(),
+                        help='number of worker processes, 1 solves in this process')
+    parser.add_argument('--mapping-method', default='exhaustive',
+                        choices=['exhaustive', 'branch_and_bound', 'assignment'])
+    parser.add_argument('--profile', help='write per-problem phase timings to this .json or .csv file')
+    parser.add_argument('--cache', help='cache of parsed problems, reused across runs while the files are unchanged')
+    parser.add_argument('--packed', help='solve the problems of this packed corpus file, see PackedCorpus.py')
+    args = parser.parse_args()
+
+    run(args.path, args.results, args.workers, args.mapping_method, args.profile, args.cache, args.packed)
+
+if __name__ == "__main__":
+    main()
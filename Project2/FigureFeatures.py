@@ -0,0 +1,48 @@
+# Derived data of a figure dictionary, computed once when the problem is converted
+# instead of re-scanning the objects in every helper.
+
+# Number of edges of each polygon shape
+EDGE_COUNTS = {
+    'triangle': 3,
+    'square': 4,
+    'pentagon': 5,
+    'hexagon': 6,
+    'heptagon': 7,
+    'octagon': 8
+}
+
+class FigureFeatures:
+    # Computes the features of a figure dictionary of {object name: {attr: [value, ...]}}.
+    #
+    # @param figure the figure dictionary
+    def __init__(self, figure):
+        # every shape of every object, with repeats
+        self.shapes = [shape for name, obj in figure.iteritems() for shape in obj.get('shape') or []]
+        self.shape_set = frozenset(self.shapes)
+        # total number of edges, None if a shape is not a polygon
+        edge_counts = [EDGE_COUNTS.get(shape) for shape in self.shapes]
+        self.edge_count = sum(edge_counts) if None not in edge_counts else None
+        self.object_names = frozenset(figure.keys())
+
+        # attributes of each object split in position attributes such as inside, left-of, above, etc, whose
+        # values are all object names, and the others
+        self.relational = {}
+        self.non_relational = {}
+        for name, obj in figure.iteritems():
+            self.relational[name] = {}
+            self.non_relational[name] = {}
+            for attr, val in obj.iteritems():
+                if val is not None and attr != 'shape' and set(val) <= self.object_names:
+                    self.relational[name][attr] = val
+                else:
+                    self.non_relational[name][attr] = val
+
+        # (vocabulary, compact objects) of the figure, set by the Agent the first time it is needed
+        self.compact = None
+
+# A figure dictionary of {object name: {attr: [value, ...]}} that carries its FigureFeatures.
+# The features are computed when the figure is created, so it must not be modified afterwards.
+class Figure(dict):
+    def __init__(self, items):
+        dict.__init__(self, items)
+        self.features = FigureFeatures(self)
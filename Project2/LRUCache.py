@@ -0,0 +1,82 @@
+# A bounded dictionary that evicts the least recently used entry when full,
+# and counts its hits and misses.
+#
+# The entries are kept in a circular doubly linked list of [prev, next, key, value]
+# links, most recently used last, so a hit only relinks one entry.
+PREV, NEXT, KEY, VALUE = 0, 1, 2, 3
+
+class LRUCache:
+    # Creates a new empty cache holding at most maxsize entries.
+    #
+    # @param maxsize the maximum number of entries
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self.links = {}
+        self.root = []
+        self.root[:] = [self.root, self.root, None, None]
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        """
+        Method to get the value of a key, marking it as the most recently used
+
+        :param key:
+        :param default:
+        :return:
+        """
+        link = self.links.get(key)
+        if link is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+
+        # move the link to the end of the list
+        link_prev, link_next = link[PREV], link[NEXT]
+        link_prev[NEXT] = link_next
+        link_next[PREV] = link_prev
+        last = self.root[PREV]
+        last[NEXT] = self.root[PREV] = link
+        link[PREV] = last
+        link[NEXT] = self.root
+        return link[VALUE]
+
+    def put(self, key, value):
+        """
+        Method to add a key, evicting the least recently used key when the cache is full
+
+        :param key:
+        :param value:
+        :return:
+        """
+        link = self.links.get(key)
+        if link is not None:
+            link[PREV][NEXT] = link[NEXT]
+            link[NEXT][PREV] = link[PREV]
+            del self.links[key]
+        elif len(self.links) >= self.maxsize:
+            oldest = self.root[NEXT]
+            oldest[NEXT][PREV] = self.root
+            self.root[NEXT] = oldest[NEXT]
+            del self.links[oldest[KEY]]
+
+        last = self.root[PREV]
+        link = [last, self.root, key, value]
+        last[NEXT] = self.root[PREV] = self.links[key] = link
+
+    def clear(self):
+        """
+        Method to remove every entry and reset the counters
+
+        :return:
+        """
+        self.links.clear()
+        self.root[:] = [self.root, self.root, None, None]
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.links)
+
+    def __contains__(self, key):
+        return key in self.links
@@ -0,0 +1,117 @@
+# Load test of a running Server.py. Every client thread keeps one connection open and
+# sends the problem files under the given paths one request at a time, waiting for each
+# answer, until the requests are all sent. Reports throughput, latency percentiles,
+# the answer statuses and the accuracy of the answers, exact or truncated.
+#
+#   python Server.py --port 8765 --workers 4 &
+#   python LoadTest.py --port 8765 --clients 16 --requests 1000 --path Problems
+from __future__ import print_function
+import argparse
+import itertools
+import socket
+import threading
+import time
+
+from Benchmark import get_percentile
+from Driver import list_problem_files
+
+
+def load_requests(paths):
+    """
+    Method to read the problem files under the problem set folders of paths as requests
+
+    :param paths:
+    :return: list of (request text, correct answer)
+    """
+    requests = []
+    for path in paths:
+        for set_name, files in list_problem_files(path):
+            for problem_file in files:
+                with open(problem_file) as request_file:
+                    text = request_file.read()
+                requests.append((text.rstrip('\n') + '\n\n', text.split('\n')[2].strip()))
+    return requests
+
+
+def run_client(host, port, requests, next_request, num_requests, results, lock):
+    """
+    Method to send requests over one connection until num_requests are sent by all the clients
+
+    :param host:
+    :param port:
+    :param requests: list of (request text, correct answer), sent round robin
+    :param next_request: shared counter of the requests sent
+    :param num_requests:
+    :param results: list to append the (latency, status, correct) of every request to
+    :param lock: lock of next_request and results
+    :return:
+    """
+    connection = socket.create_connection((host, port))
+    replies = connection.makefile('r')
+    try:
+        while True:
+            with lock:
+                number = next(next_request)
+            if number >= num_requests:
+                break
+            text, correct_answer = requests[number % len(requests)]
+            start = time.time()
+            connection.sendall(text)
+            line = replies.readline()
+            latency = time.time() - start
+            if not line:
+                break
+            fields = line.rstrip('\n').split('\t')
+            status = fields[1] if len(fields) > 1 else 'error'
+            answer = fields[2] if len(fields) > 2 else ''
+            with lock:
+                results.append((latency, status, status in ('ok', 'truncated') and answer == correct_answer))
+    finally:
+        replies.close()
+        connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test a running Server.py')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--path', action='append', help='problems folder, may be repeated (default Problems)')
+    parser.add_argument('--clients', type=int, default=8, help='concurrent connections')
+    parser.add_argument('--requests', type=int, default=500, help='requests sent by all the clients together')
+    args = parser.parse_args()
+
+    requests = load_requests(args.path or ['Problems'])
+    next_request = itertools.count()
+    results = []
+    lock = threading.Lock()
+    clients = [threading.Thread(target=run_client, args=(args.host, args.port, requests, next_request, args.requests,
+                                                          results, lock))
+               for client in range(args.clients)]
+
+    start = time.time()
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    total_time = time.time() - start
+
+    if not results:
+        print('no answers')
+        return
+    latencies = [latency for latency, status, correct in results]
+    statuses = {}
+    for latency, status, correct in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    answered = statuses.get('ok', 0) + statuses.get('truncated', 0)
+
+    print('requests: %d in %.2fs, %.1f requests/sec' % (len(results), total_time, len(results) / total_time))
+    print('latency p50 %.1fms p95 %.1fms p99 %.1fms max %.1fms' % (
+        get_percentile(latencies, 50) * 1000, get_percentile(latencies, 95) * 1000,
+        get_percentile(latencies, 99) * 1000, max(latencies) * 1000))
+    print('statuses: %s' % ', '.join('%s %d' % (status, count) for status, count in sorted(statuses.iteritems())))
+    if answered:
+        print('accuracy of the answers: %.3f' % (sum(correct for latency, status, correct in results) /
+                                                 float(answered)))
+
+if __name__ == "__main__":
+    main()
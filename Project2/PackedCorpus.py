@@ -0,0 +1,257 @@
+# Packed corpus format: a whole problem bank in one file, read through mmap.
+#
+#   python PackedCorpus.py --path Problems --output Problems.pack
+#
+# Layout, all integers little-endian:
+#   header      magic, version, number of problems, number of strings, offset of the
+#               string table, offset of the problem index
+#   records     fixed-width (uint32, uint32) records, starting right after the header.
+#               A problem is (name, type), (answer, number of figures), then for every
+#               figure (name, number of objects), for every object (name, number of
+#               attributes) and for every attribute (name, value), all as string ids
+#   strings     (offset, length) of every string, then the bytes of the strings. Every
+#               name and value is stored once and referred to by its id
+#   index       (set name id, first record) of every problem, in the order the
+#               problems were packed
+#
+# The file is mapped read-only, so the worker processes of a pool share its pages.
+# Problems are returned as PackedProblems, RavensProblems whose figures are decoded
+# from the records, as CompactRavensFigures, the first time they are needed.
+from __future__ import print_function
+import argparse
+import mmap
+import os
+import struct
+
+from CompactRavens import CompactRavensAttribute, CompactRavensFigure, CompactRavensObject
+from ProblemLoader import parse_problem_text
+from RavensProblem import RavensProblem
+
+MAGIC = b'RPMPACK\0'
+VERSION = 1
+
+HEADER = struct.Struct('<8sIQQQQ')
+RECORD = struct.Struct('<II')
+STRING = struct.Struct('<QI')
+INDEX = struct.Struct('<IQ')
+
+
+# A RavensProblem of a PackedCorpus. Its figures are decoded on the first call to getFigures.
+class PackedProblem(RavensProblem):
+    def __init__(self, corpus, index, name, problemType, correctAnswer):
+        RavensProblem.__init__(self, name, problemType, correctAnswer)
+        self.corpus = corpus
+        self.index = index
+        self.figures = None
+
+    def getFigures(self):
+        if self.figures is None:
+            self.figures = self.corpus.read_figures(self.index)
+        return self.figures
+
+class PackedCorpus:
+    # Opens a packed corpus file and maps it into memory.
+    #
+    # @param path the packed corpus file
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as corpus_file:
+            self.data = mmap.mmap(corpus_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.num_problems, self.num_strings, self.strings_offset, self.index_offset = \
+            HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            self.data.close()
+            raise ValueError('%s is not a version %d packed corpus' % (path, VERSION))
+        self.blob_offset = self.strings_offset + self.num_strings * STRING.size
+        # strings decoded so far, by id
+        self.strings = [None] * self.num_strings
+
+    def __len__(self):
+        return self.num_problems
+
+    def close(self):
+        """
+        Method to unmap the file. Problems whose figures were not decoded yet can no longer be read
+
+        :return:
+        """
+        self.data.close()
+
+    def get_string(self, string_id):
+        """
+        Method to get a string of the string table, decoding it the first time
+
+        :param string_id:
+        :return:
+        """
+        string = self.strings[string_id]
+        if string is None:
+            offset, length = STRING.unpack_from(self.data, self.strings_offset + string_id * STRING.size)
+            start = self.blob_offset + offset
+            string = self.strings[string_id] = self.data[start:start + length]
+        return string
+
+    def get_record(self, record):
+        """
+        Method to get the two values of a record
+
+        :param record: record number
+        :return:
+        """
+        return RECORD.unpack_from(self.data, HEADER.size + record * RECORD.size)
+
+    def get_set_name(self, index):
+        """
+        Method to get the problem set name of a problem
+
+        :param index: problem number
+        :return:
+        """
+        set_id, record = INDEX.unpack_from(self.data, self.index_offset + index * INDEX.size)
+        return self.get_string(set_id)
+
+    def get_problem(self, index):
+        """
+        Method to get a problem, its figures are only decoded when they are used
+
+        :param index: problem number
+        :return: PackedProblem
+        """
+        set_id, record = INDEX.unpack_from(self.data, self.index_offset + index * INDEX.size)
+        name_id, type_id = self.get_record(record)
+        answer_id, num_figures = self.get_record(record + 1)
+        return PackedProblem(self, index, self.get_string(name_id), self.get_string(type_id),
+                             self.get_string(answer_id))
+
+    def get_record_end(self, index):
+        """
+        Method to get the record after the last record of a problem
+
+        :param index: problem number
+        :return:
+        """
+        if index + 1 < self.num_problems:
+            return INDEX.unpack_from(self.data, self.index_offset + (index + 1) * INDEX.size)[1]
+        return (self.strings_offset - HEADER.size) // RECORD.size
+
+    def read_figures(self, index):
+        """
+        Method to decode the figures of a problem. Its records are unpacked in one call
+
+        :param index: problem number
+        :return: dictionary of figure name -> CompactRavensFigure
+        """
+        set_id, record = INDEX.unpack_from(self.data, self.index_offset + index * INDEX.size)
+        num_values = (self.get_record_end(index) - record) * 2
+        values = struct.unpack_from('<%dI' % num_values, self.data, HEADER.size + record * RECORD.size)
+        get_string = self.get_string
+
+        num_figures = values[3]
+        position = 4
+        figures = {}
+        for f in range(num_figures):
+            figure_name = get_string(values[position])
+            num_objects = values[position + 1]
+            position += 2
+            objects = []
+            for o in range(num_objects):
+                object_name = get_string(values[position])
+                end = position + 2 + values[position + 1] * 2
+                objects.append(CompactRavensObject(object_name, [
+                    CompactRavensAttribute(get_string(values[a]), get_string(values[a + 1]))
+                    for a in range(position + 2, end, 2)]))
+                position = end
+            figures[figure_name] = CompactRavensFigure(figure_name, objects)
+        return figures
+
+    def get_sets(self):
+        """
+        Method to group the problem numbers by problem set, in the order they were packed
+
+        :return: list of (set name, list of problem numbers)
+        """
+        sets = []
+        for index in range(self.num_problems):
+            set_name = self.get_set_name(index)
+            if not sets or sets[-1][0] != set_name:
+                sets.append((set_name, []))
+            sets[-1][1].append(index)
+        return sets
+
+    def iter_problems(self):
+        """
+        Generator over every problem, yields (set name, PackedProblem) like ProblemLoader.iter_problems
+
+        :return:
+        """
+        for index in range(self.num_problems):
+            yield self.get_set_name(index), self.get_problem(index)
+
+
+def pack_corpus(path, output_path):
+    """
+    Method to pack every problem file under the problem set folders of path into one file, in the same order as the
+    main driver. The records are written as the files are read, only the strings and the index are kept in memory
+
+    :param path:
+    :param output_path:
+    :return: number of problems packed
+    """
+    string_ids = {}
+    strings = []
+    index = []
+
+    def get_string_id(string):
+        string_id = string_ids.get(string)
+        if string_id is None:
+            string_id = string_ids[string] = len(strings)
+            strings.append(string)
+        return string_id
+
+    with open(output_path, 'wb') as output:
+        output.write(b'\0' * HEADER.size)
+        num_records = 0
+        for set_name in os.listdir(path):
+            set_path = os.path.join(path, set_name)
+            for file_name in os.listdir(set_path):
+                with open(os.path.join(set_path, file_name)) as problem_file:
+                    name, problem_type, answer, figures = parse_problem_text(problem_file.read())
+
+                records = [(get_string_id(name), get_string_id(problem_type)), (get_string_id(answer), len(figures))]
+                for figure_name, objects in figures:
+                    records.append((get_string_id(figure_name), len(objects)))
+                    for object_name, attributes in objects:
+                        records.append((get_string_id(object_name), len(attributes)))
+                        for attr_name, value in attributes:
+                            records.append((get_string_id(attr_name), get_string_id(value)))
+
+                index.append((get_string_id(set_name), num_records))
+                output.write(b''.join(RECORD.pack(*record) for record in records))
+                num_records += len(records)
+
+        strings_offset = output.tell()
+        offset = 0
+        for string in strings:
+            output.write(STRING.pack(offset, len(string)))
+            offset += len(string)
+        output.write(b''.join(strings))
+
+        index_offset = output.tell()
+        output.write(b''.join(INDEX.pack(*entry) for entry in index))
+
+        output.seek(0)
+        output.write(HEADER.pack(MAGIC, VERSION, len(index), len(strings), strings_offset, index_offset))
+
+    return len(index)
+
+def main():
+    parser = argparse.ArgumentParser(description='Pack the problem set folders into one packed corpus file')
+    parser.add_argument('--path', default='Problems')
+    parser.add_argument('--output', required=True)
+    args = parser.parse_args()
+
+    print('packed %d problems into %s' % (pack_corpus(args.path, args.output), args.output))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# Persistent on-disk cache of parsed problem files, so unchanged problems are not
+# parsed again on every run.
+#
+# Entries are keyed by the problem file path and hold the mtime, size and SHA-1 of
+# the file with the output of ProblemLoader.parse_problem_text. An entry is used when:
+#   - the mtime and size of the file are unchanged, without reading the file, or
+#   - they changed but the content hash is the same (i.e. the file was touched or
+#     copied), then only the mtime and size of the entry are updated.
+# Otherwise the file is parsed again and its entry replaced. With verify=True every
+# file is hashed, for file systems whose mtimes are too coarse to notice a change.
+#
+# The entries are only builtin types, written with marshal, which loads them about
+# twice as fast as pickle. The cache file records CACHE_VERSION and the Python version,
+# because the marshal format depends on it, and is discarded when either does not
+# match, so CACHE_VERSION must be bumped whenever the output of parse_problem_text
+# changes. A cache file that cannot be read is ignored and rebuilt, prune drops the
+# entries of deleted files, and deleting the cache file is always safe.
+import hashlib
+import marshal
+import os
+import sys
+
+from ProblemLoader import parse_problem_text
+
+CACHE_VERSION = 1
+
+class ProblemCache:
+    # Creates a cache backed by the file at path, loading its entries if it exists.
+    #
+    # @param path the cache file
+    # @param verify hash every problem file instead of trusting unchanged mtimes and sizes
+    def __init__(self, path='.problem_cache', verify=False):
+        self.path = path
+        self.verify = verify
+        # problem file path -> (mtime, size, sha1, parsed problem)
+        self.entries = {}
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+        self.load()
+
+    def load(self):
+        """
+        Method to read the entries of the cache file, leaving the cache empty if the file is missing, unreadable or
+        of another version
+
+        :return:
+        """
+        self.entries = {}
+        try:
+            with open(self.path, 'rb') as cache_file:
+                version, python_version, entries = marshal.load(cache_file)
+        except (IOError, OSError, EOFError, ValueError, TypeError):
+            return
+        if version == CACHE_VERSION and python_version == tuple(sys.version_info[:2]) and isinstance(entries, dict):
+            self.entries = entries
+
+    def save(self):
+        """
+        Method to write the entries to the cache file if they changed. The file is written next to the cache file
+        and renamed over it, so an interrupted save never leaves a truncated cache
+
+        :return:
+        """
+        if not self.dirty:
+            return
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'wb') as cache_file:
+            marshal.dump((CACHE_VERSION, tuple(sys.version_info[:2]), self.entries), cache_file)
+        os.rename(temp_path, self.path)
+        self.dirty = False
+
+    def get_parsed(self, path):
+        """
+        Method to get the parsed problem of a problem file, from the cache if the file is unchanged
+
+        :param path:
+        :return: see ProblemLoader.parse_problem_text
+        """
+        stat = os.stat(path)
+        entry = self.entries.get(path)
+        if entry is not None and not self.verify and entry[0] == stat.st_mtime and entry[1] == stat.st_size:
+            self.hits += 1
+            return entry[3]
+
+        with open(path) as problem_file:
+            text = problem_file.read()
+        digest = hashlib.sha1(text).hexdigest()
+
+        if entry is not None and entry[2] == digest:
+            self.hits += 1
+            parsed = entry[3]
+        else:
+            self.misses += 1
+            parsed = parse_problem_text(text)
+
+        if entry is None or entry[:3] != (stat.st_mtime, stat.st_size, digest):
+            self.entries[path] = (stat.st_mtime, stat.st_size, digest, parsed)
+            self.dirty = True
+        return parsed
+
+    def prune(self):
+        """
+        Method to drop the entries of problem files that no longer exist
+
+        :return:
+        """
+        for path in [path for path in self.entries if not os.path.isfile(path)]:
+            del self.entries[path]
+            self.dirty = True
+
+    def clear(self):
+        """
+        Method to drop every entry
+
+        :return:
+        """
+        self.entries = {}
+        self.dirty = True
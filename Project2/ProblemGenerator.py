@@ -0,0 +1,224 @@
+# Generator of synthetic problems in the text format read by ProblemSet.addProblem,
+# for scaling tests with many objects, attributes and answer options.
+#
+#   python ProblemGenerator.py --output "Synthetic/2x1 Synthetic Problems" --objects 8 --count 10
+#
+# Every cell of the matrix is the first figure with a row transformation applied once
+# per column and a column transformation applied once per row. A transformation steps
+# attribute values forward through their value lists, so it can be chained. The
+# correct answer is the last cell; the other options change one more attribute of it.
+from __future__ import print_function
+import argparse
+import os
+import random
+
+# Object names are assigned starting with the letter Z and proceeding backwards in the alphabet
+OBJECT_NAMES = 'ZYXWVUTSRQPONMLKJIHGFEDCBA'
+
+SHAPES = ['circle', 'square', 'triangle', 'pentagon', 'hexagon', 'octagon', 'diamond', 'rectangle']
+
+# Non-relational attributes and their values, in the order a transformation steps through them
+ATTRIBUTES = [
+    ('fill', ['no', 'yes', 'top-half', 'right-half', 'bottom-half', 'left-half']),
+    ('size', ['small', 'medium', 'large', 'huge']),
+    ('angle', ['0', '45', '90', '135', '180', '225', '270', '315']),
+    ('vertical-flip', ['no', 'yes'])
+]
+
+RELATIONS = ['inside', 'above', 'left-of']
+
+# Figure names of each problem type, row by row, without the missing last cell
+GRIDS = {
+    '2x1': (2, 'ABC'),
+    '2x2': (2, 'ABC'),
+    '3x3': (3, 'ABCDEFGH')
+}
+
+
+def create_base_figure(rng, num_objects, num_attributes, num_relations):
+    """
+    Method to create the first figure as a list of objects. Each object maps an attribute to the index of its
+    value, and 'relations' to a dictionary of relation -> list of related object indexes
+
+    :param rng:
+    :param num_objects:
+    :param num_attributes: number of non-relational attributes per object, besides shape
+    :param num_relations: number of relational attributes in the figure
+    :return:
+    """
+    figure = []
+    for index in range(num_objects):
+        obj = {'shape': rng.randrange(len(SHAPES)), 'relations': {}}
+        for attr, values in rng.sample(ATTRIBUTES, min(num_attributes, len(ATTRIBUTES))):
+            obj[attr] = rng.randrange(len(values))
+        figure.append(obj)
+
+    if num_objects > 1:
+        for i in range(num_relations):
+            index = rng.randrange(num_objects)
+            others = [other for other in range(num_objects) if other != index]
+            relation = rng.choice(RELATIONS)
+            related = figure[index].get('relations').setdefault(relation, [])
+            related.extend(other for other in rng.sample(others, rng.randint(1, len(others))) if other not in related)
+
+    return figure
+
+def create_transformation(rng, figure, num_transformations, attrs):
+    """
+    Method to pick which (object index, attribute) pairs a transformation steps forward
+
+    :param rng:
+    :param figure:
+    :param num_transformations:
+    :param attrs: attributes the transformation may change
+    :return:
+    """
+    candidates = [(index, attr) for index, obj in enumerate(figure) for attr in attrs if attr in obj]
+    return rng.sample(candidates, min(num_transformations, len(candidates)))
+
+def apply_transformation(figure, transformation, steps=1):
+    """
+    Method to create a new figure with the values of the transformation stepped forward
+
+    :param figure:
+    :param transformation:
+    :param steps:
+    :return:
+    """
+    new_figure = [dict(obj) for obj in figure]
+    for index, attr in transformation:
+        new_figure[index][attr] += steps
+    return new_figure
+
+def get_value(attr, value_index):
+    """
+    Method to get the value string of an attribute value index
+
+    :param attr:
+    :param value_index:
+    :return:
+    """
+    values = SHAPES if attr == 'shape' else dict(ATTRIBUTES).get(attr)
+    return values[value_index % len(values)]
+
+def get_signature(figure):
+    """
+    Method to get a hashable form of a figure, to keep the options unique
+
+    :param figure:
+    :return:
+    """
+    return tuple(tuple(sorted((attr, get_value(attr, value)) for attr, value in obj.iteritems()
+                              if attr != 'relations')) for obj in figure)
+
+def format_figure(rng, name, figure, shuffle_names):
+    """
+    Method to format a figure as the lines of a problem file. Object names do not imply correspondence between
+    figures, so they are shuffled unless shuffle_names is False
+
+    :param rng:
+    :param name:
+    :param figure:
+    :param shuffle_names:
+    :return:
+    """
+    names = list(OBJECT_NAMES[:len(figure)])
+    if shuffle_names:
+        rng.shuffle(names)
+
+    lines = [name]
+    for index, obj in enumerate(figure):
+        lines.append('\t' + names[index])
+        lines.append('\t\tshape:' + get_value('shape', obj.get('shape')))
+        for attr, values in ATTRIBUTES:
+            if attr in obj:
+                lines.append('\t\t' + attr + ':' + get_value(attr, obj.get(attr)))
+        for relation in RELATIONS:
+            related = obj.get('relations').get(relation)
+            if related:
+                lines.append('\t\t' + relation + ':' + ','.join(names[other] for other in related))
+    return lines
+
+def generate_problem(rng, name, problem_type='2x1', num_objects=4, num_attributes=2, num_relations=2,
+                     num_transformations=2, num_options=6, shuffle_names=True):
+    """
+    Method to generate the text of one problem file
+
+    :param rng:
+    :param name:
+    :param problem_type: 2x1, 2x2 or 3x3
+    :param num_objects:
+    :param num_attributes:
+    :param num_relations:
+    :param num_transformations: number of (object, attribute) pairs changed by the row and the column transformation
+    :param num_options:
+    :param shuffle_names:
+    :return:
+    """
+    if num_objects > len(OBJECT_NAMES):
+        raise ValueError('at most %d objects per figure' % len(OBJECT_NAMES))
+    size, figure_names = GRIDS.get(problem_type)
+
+    base = create_base_figure(rng, num_objects, num_attributes, num_relations)
+    attrs = [attr for attr, values in ATTRIBUTES]
+    row_transformation = create_transformation(rng, base, num_transformations, attrs)
+    column_transformation = create_transformation(rng, base, num_transformations, attrs + ['shape'])
+
+    # cell (row, column) is the first figure with the row transformation applied column times and the column
+    # transformation applied row times
+    cells = []
+    for row in range(size):
+        for column in range(size):
+            cell = apply_transformation(base, row_transformation, column)
+            cells.append(apply_transformation(cell, column_transformation, row))
+    answer_figure = cells.pop()
+
+    # the other options change one more attribute of the answer
+    options = [answer_figure]
+    signatures = set([get_signature(answer_figure)])
+    candidates = [(index, attr) for index, obj in enumerate(answer_figure) for attr in obj if attr != 'relations']
+    for attempt in range(100 * num_options):
+        if len(options) == num_options or not len(candidates):
+            break
+        option = apply_transformation(answer_figure, [rng.choice(candidates)], rng.randint(1, 3))
+        if get_signature(option) not in signatures:
+            signatures.add(get_signature(option))
+            options.append(option)
+    rng.shuffle(options)
+    answer = options.index(answer_figure) + 1
+
+    lines = [name, problem_type, str(answer)]
+    for figure_name, figure in zip(figure_names, cells):
+        lines += format_figure(rng, figure_name, figure, shuffle_names)
+    for index, option in enumerate(options):
+        lines += format_figure(rng, str(index + 1), option, shuffle_names)
+
+    return '\n'.join(lines) + '\n'
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic problem files')
+    parser.add_argument('--output', required=True, help='problem set folder to write the files to')
+    parser.add_argument('--type', default='2x1', choices=sorted(GRIDS.keys()))
+    parser.add_argument('--count', type=int, default=10)
+    parser.add_argument('--objects', type=int, default=4)
+    parser.add_argument('--attributes', type=int, default=2, help='non-relational attributes per object')
+    parser.add_argument('--relations', type=int, default=2, help='relational attributes per figure')
+    parser.add_argument('--transformations', type=int, default=2)
+    parser.add_argument('--options', type=int, default=6)
+    parser.add_argument('--no-shuffle-names', dest='shuffle_names', action='store_false')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    if not os.path.isdir(args.output):
+        os.makedirs(args.output)
+    for number in range(1, args.count + 1):
+        name = '%s Synthetic Problem %02d' % (args.type, number)
+        text = generate_problem(rng, name, args.type, args.objects, args.attributes, args.relations,
+                                args.transformations, args.options, args.shuffle_names)
+        with open(os.path.join(args.output, '%sSyntheticProblem%02d.txt' % (args.type, number)), 'w') as output:
+            output.write(text)
+    print('wrote %d problems to %s' % (args.count, args.output))
+
+if __name__ == "__main__":
+    main()
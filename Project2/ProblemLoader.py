@@ -0,0 +1,131 @@
+# Fast loading of problem files in the format read by ProblemSet.addProblem.
+#
+# Each file is read in one call and closed right away, lines are split on ':' without
+# regular expressions, and whole folders can be streamed one problem at a time so
+# solving can start as soon as the first problem is parsed. Given a ProblemCache,
+# unchanged files are taken from the cache instead of being parsed again.
+import os
+
+from CompactRavens import CompactRavensAttribute, CompactRavensFigure, CompactRavensObject
+from ProblemSet import ProblemSet
+from RavensAttribute import RavensAttribute
+from RavensFigure import RavensFigure
+from RavensObject import RavensObject
+from RavensProblem import RavensProblem
+
+
+def parse_problem_text(text):
+    """
+    Method to parse the text of a problem file the same way ProblemSet.addProblem does: name, type and answer on
+    the first three lines, then figures, tab-indented objects and double tab-indented name:value attributes up to
+    the first empty line
+
+    :param text:
+    :return: (name, type, answer, [(figure name, [(object name, [(attr name, value), ...]), ...]), ...])
+    """
+    lines = [line.rstrip() for line in text.split('\n')]
+    lines += [''] * (4 - len(lines))
+    name, problem_type, answer = lines[0], lines[1], lines[2]
+
+    figures = []
+    current_objects = None
+    current_attributes = None
+    for line in lines[3:]:
+        if line == '':
+            break
+        if not line.startswith('\t'):
+            current_objects = []
+            figures.append((line, current_objects))
+        elif not line.startswith('\t\t'):
+            current_attributes = []
+            current_objects.append((line.replace('\t', ''), current_attributes))
+        else:
+            split = line.replace('\t', '').split(':', 2)
+            current_attributes.append((split[0], split[1]))
+
+    return name, problem_type, answer, figures
+
+def build_problem(parsed, compact=False):
+    """
+    Method to build a RavensProblem from the output of parse_problem_text
+
+    :param parsed:
+    :param compact: build CompactRavensFigures instead of RavensFigures
+    :return:
+    """
+    name, problem_type, answer, figures = parsed
+    problem = RavensProblem(name, problem_type, answer)
+    for figure_name, objects in figures:
+        if compact:
+            figure = CompactRavensFigure(figure_name, [
+                CompactRavensObject(object_name, [CompactRavensAttribute(attr_name, value)
+                                                  for attr_name, value in attributes])
+                for object_name, attributes in objects])
+        else:
+            figure = RavensFigure(figure_name)
+            for object_name, attributes in objects:
+                obj = RavensObject(object_name)
+                for attr_name, value in attributes:
+                    obj.getAttributes().append(RavensAttribute(attr_name, value))
+                figure.getObjects().append(obj)
+        problem.getFigures()[figure_name] = figure
+
+    return problem
+
+def parse_problem(text, compact=False):
+    """
+    Method to parse the text of a problem file into a RavensProblem
+
+    :param text:
+    :param compact: build CompactRavensFigures instead of RavensFigures
+    :return:
+    """
+    return build_problem(parse_problem_text(text), compact)
+
+def load_problem(path, compact=False, cache=None):
+    """
+    Method to read and parse one problem file
+
+    :param path:
+    :param compact:
+    :param cache: ProblemCache to take the parsed problem from, if it is unchanged
+    :return:
+    """
+    if cache is not None:
+        return build_problem(cache.get_parsed(path), compact)
+    with open(path) as problem_file:
+        text = problem_file.read()
+    return parse_problem(text, compact)
+
+def iter_problems(path='Problems', compact=False, cache=None):
+    """
+    Generator over every problem under the problem set folders of path, in the same order as the main driver.
+    Yields (set name, RavensProblem) as soon as each file is parsed
+
+    :param path:
+    :param compact:
+    :param cache:
+    :return:
+    """
+    for set_name in os.listdir(path):
+        set_path = os.path.join(path, set_name)
+        for file_name in os.listdir(set_path):
+            yield set_name, load_problem(os.path.join(set_path, file_name), compact, cache)
+
+def load_problem_sets(path='Problems', compact=False, cache=None):
+    """
+    Method to load every problem set under path into ProblemSets
+
+    :param path:
+    :param compact:
+    :param cache:
+    :return:
+    """
+    sets = []
+    for set_name in os.listdir(path):
+        problem_set = ProblemSet(set_name)
+        set_path = os.path.join(path, set_name)
+        for file_name in os.listdir(set_path):
+            problem_set.getProblems().append(load_problem(os.path.join(set_path, file_name), compact, cache))
+        sets.append(problem_set)
+    return sets
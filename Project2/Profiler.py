@@ -0,0 +1,150 @@
+# Opt-in timing of the phases of Agent.Solve and Agent.solve_many.
+#
+# Profiler.attach wraps the phase methods of one Agent instance with timed versions,
+# so an Agent without a profiler runs the plain methods with no overhead. Each solved
+# problem gets a record of the wall time and call count of every phase, and of the
+# number of permutations (or search nodes) scored by map_identity and of the answer
+# options ruled out by each filter stage of solve2x1.
+# A solve_many batch also gets a record of its own, of type 'batch', holding its total
+# time.
+import csv
+import json
+import time
+
+# Agent methods timed as phases. Times are inclusive, e.g. solve2x1 contains map_identity
+PHASES = ['Solve', 'solve_many', 'solve_problem', 'convert_problem_to_dict', 'get_problem_fingerprint', 'solve2x1',
+          'solve2x2', 'solve3x3', 'map_identity', 'get_semantic_network', 'create_guess_figure',
+          'get_normalized_name_guess', 'match_figures_new']
+
+class Profiler:
+    # Creates a new profiler with no records.
+    def __init__(self):
+        self.records = []
+        self.current = None
+        # whether a Solve call is running, otherwise solve_problem is called directly and starts the record
+        self.solving = False
+
+    def attach(self, agent):
+        """
+        Method to wrap the phase methods of an agent so every call is recorded
+
+        :param agent:
+        :return:
+        """
+        for phase in PHASES:
+            setattr(agent, phase, self.wrap(agent, phase, getattr(agent, phase)))
+
+    def wrap(self, agent, phase, method):
+        """
+        Method to create the timed version of a bound method
+
+        :param agent:
+        :param phase:
+        :param method:
+        :return:
+        """
+        def timed(*args, **kwargs):
+            if phase == 'Solve':
+                self.start_problem(args[0].getName(), args[0].getProblemType())
+                self.solving = True
+            elif phase == 'solve_many':
+                # the batch gets a record of its own for its total time, each problem is recorded by Solve
+                self.start_problem('batch of %d problems' % len(args[0]), 'batch')
+                batch = self.current
+            elif phase == 'solve_problem' and not self.solving:
+                self.start_problem(args[0].get('name'), args[0].get('type'))
+            start = time.time()
+            result = method(*args, **kwargs)
+            if phase == 'Solve':
+                self.solving = False
+            elif phase == 'solve_many':
+                self.current = batch
+            self.add(phase, time.time() - start)
+            if phase == 'map_identity':
+                self.current['permutations'] += agent.nodes_explored
+            elif phase == 'solve2x1':
+                eliminated = self.current.get('eliminated')
+                for stage, count in agent.options_eliminated.iteritems():
+                    eliminated[stage] = eliminated.get(stage, 0) + count
+            return result
+        return timed
+
+    def start_problem(self, name, problem_type):
+        """
+        Method to start the record of a new problem
+
+        :param name:
+        :param problem_type:
+        :return:
+        """
+        self.current = {'problem': name, 'type': problem_type, 'phases': {}, 'permutations': 0,
+                        'eliminated': {}}
+        self.records.append(self.current)
+
+    def add(self, phase, seconds, calls=1):
+        """
+        Method to add time and calls to a phase of the current problem
+
+        :param phase:
+        :param seconds:
+        :param calls:
+        :return:
+        """
+        if self.current is None:
+            self.start_problem('', '')
+        timing = self.current.get('phases').setdefault(phase, {'calls': 0, 'time': 0.0})
+        timing['calls'] += calls
+        timing['time'] += seconds
+
+    def get_totals(self):
+        """
+        Method to sum the phases over every problem
+
+        :return: dictionary of phase -> {'calls', 'time'}
+        """
+        totals = {}
+        for record in self.records:
+            for phase, timing in record.get('phases').iteritems():
+                total = totals.setdefault(phase, {'calls': 0, 'time': 0.0})
+                total['calls'] += timing.get('calls')
+                total['time'] += timing.get('time')
+        return totals
+
+    def write_json(self, path):
+        """
+        Method to write the records and totals as JSON
+
+        :param path:
+        :return:
+        """
+        with open(path, 'w') as output:
+            json.dump({'problems': self.records, 'totals': self.get_totals()}, output, indent=2, sort_keys=True)
+
+    def write_csv(self, path):
+        """
+        Method to write one row per problem and phase as CSV
+
+        :param path:
+        :return:
+        """
+        with open(path, 'wb') as output:
+            writer = csv.writer(output)
+            writer.writerow(['problem', 'type', 'phase', 'calls', 'time', 'permutations'])
+            for record in self.records:
+                for phase in PHASES:
+                    timing = record.get('phases').get(phase)
+                    if timing is not None:
+                        writer.writerow([record.get('problem'), record.get('type'), phase, timing.get('calls'),
+                                         '%.6f' % timing.get('time'), record.get('permutations')])
+
+    def write(self, path):
+        """
+        Method to write the records as CSV if path ends with .csv, JSON otherwise
+
+        :param path:
+        :return:
+        """
+        if path.lower().endswith('.csv'):
+            self.write_csv(path)
+        else:
+            self.write_json(path)
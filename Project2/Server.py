@@ -0,0 +1,461 @@
+# Solving service: reads problems from local socket connections or stdin, solves them
+# in a pool of worker processes and streams the answers back as they are found.
+#
+#   python Server.py --port 8765 --workers 4 --timeout 10
+#   python Server.py --port 8765 --workers 4 --timeout 10 --budget 0.5
+#   for f in Problems/*/*.txt; do cat "$f"; printf '\n\n'; done | python Server.py --stdin
+#
+# A request is the text of one problem file, in the format read by ProblemSet.addProblem,
+# ended by an empty line. The empty line is required: most problem files do not end with a
+# newline, so files sent one after another with nothing in between run together, the
+# example above adds it after every file. A request whose figure names repeat holds more
+# than one problem and is answered with error. A client may also end its last request by
+# closing its side of the connection (or stdin), the answers of its requests are still sent.
+# Every request is answered by one line
+#
+#   <problem name>\t<status>\t<answer>
+#
+# in the order the requests are done, with status one of ok, truncated, timeout or error
+# (the answer is then the error message). Every problem is solved with the deadline of
+# its request, see Agent.Solve, or with a budget the deadline of budget seconds from when
+# its worker starts it if that comes first, and an answer the deadline cut short is sent
+# with status truncated.
+#
+# The server runs a single-threaded event loop over non-blocking sockets with asyncore,
+# the Python 2 counterpart of asyncio. Requests wait in a queue and are handed to the
+# worker processes one per idle worker. The pool reports results from its own thread,
+# which wakes the event loop up through a pipe. A request not answered within the
+# timeout, queued or solving, is answered with timeout. A worker cannot be interrupted,
+# but it stops searching at the deadline of its request, so a timed out request only
+# holds its worker for the work the agent does outside the searches. When
+# max_pending requests are queued or solving the server stops reading from every
+# connection until one is done, so clients that send faster than the workers solve are
+# held back by the socket buffers instead of growing the queue.
+from __future__ import print_function
+import argparse
+import asynchat
+import asyncore
+import collections
+import fcntl
+import itertools
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import time
+
+from Agent import Agent
+from ProblemLoader import build_problem, parse_problem_text
+
+# Seconds the event loop waits for socket events before checking the timeouts
+TICK = 0.05
+
+# The Agent of the current worker process, created by init_worker
+agent = None
+
+
+def init_worker(mapping_method):
+    """
+    Method to create the Agent of a worker process. Ctrl-C is left to the server, which stops the pool
+
+    :param mapping_method:
+    :return:
+    """
+    global agent
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    agent = Agent()
+    agent.mapping_method = mapping_method
+
+
+def solve_text(text, deadline=None, budget=None):
+    """
+    Method to solve the text of one problem file with the Agent of the current worker process
+
+    :param text:
+    :param deadline: time.time() value to answer by, None for no limit
+    :param budget: seconds to solve the problem in, None for no limit
+    :return: ('ok', answer), ('truncated', answer) if the deadline or the budget ran out first, or ('error', message)
+    if the problem could not be solved
+    """
+    if budget is not None:
+        deadline = min(deadline, time.time() + budget) if deadline is not None else time.time() + budget
+    try:
+        parsed = parse_problem_text(text)
+        figure_names = [figure_name for figure_name, objects in parsed[3]]
+        if len(set(figure_names)) != len(figure_names):
+            raise ValueError('repeated figure names, the request holds problems not separated by an empty line')
+        answer = agent.Solve(build_problem(parsed), deadline)
+        return 'ok' if agent.exact else 'truncated', answer
+    except Exception as error:
+        return 'error', '%s: %s' % (type(error).__name__, error)
+
+
+class RequestChannel(asynchat.async_chat):
+    # Reads the requests of one client connection and sends their answers back. Once the client closes its side the
+    # connection is closed after the last answer is sent.
+    #
+    # @param server the SolvingServer
+    # @param sock the connected socket, None for a subclass that sets its own file
+    # @param map the socket map of the server
+    def __init__(self, server, sock=None, map=None):
+        asynchat.async_chat.__init__(self, sock, map)
+        self.server = server
+        self.set_terminator('\n')
+        self.data = []
+        # lines of the request being read
+        self.lines = []
+        # number of requests submitted and not answered yet, and whether the client closed its side
+        self.pending = 0
+        self.input_closed = False
+
+    def collect_incoming_data(self, data):
+        self.data.append(data)
+
+    def found_terminator(self):
+        line = ''.join(self.data).rstrip('\r')
+        self.data = []
+        if line:
+            self.lines.append(line)
+        elif self.lines:
+            self.submit_lines()
+
+    def submit_lines(self):
+        """
+        Method to submit the lines read so far as one request
+
+        :return:
+        """
+        self.pending += 1
+        self.server.submit(self, '\n'.join(self.lines) + '\n')
+        self.lines = []
+
+    def submit_rest(self):
+        """
+        Method to submit the last request once the input is closed, it may not be followed by an empty line
+
+        :return:
+        """
+        if self.data:
+            self.found_terminator()
+        if self.lines:
+            self.submit_lines()
+
+    def readable(self):
+        return not self.input_closed and self.server.is_accepting()
+
+    def handle_close(self):
+        self.submit_rest()
+        self.input_closed = True
+        if not self.pending:
+            self.close()
+
+    def send_answer(self, line):
+        """
+        Method to send the answer line of a request, unless the client is gone, and to close the connection after
+        the last answer once the client closed its side
+
+        :param line:
+        :return:
+        """
+        self.pending -= 1
+        if self.connected:
+            self.push(line)
+            if self.input_closed and not self.pending:
+                self.close_when_done()
+
+
+class StdinChannel(RequestChannel):
+    # Reads requests from stdin and writes their answers to stdout. The server stops once stdin is closed and every
+    # request is answered.
+    #
+    # @param server the SolvingServer
+    # @param map the socket map of the server
+    def __init__(self, server, map=None):
+        RequestChannel.__init__(self, server, map=map)
+        fd = sys.stdin.fileno()
+        flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+        fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+        self.set_socket(asyncore.file_wrapper(fd))
+        self.connected = True
+
+    def handle_close(self):
+        self.submit_rest()
+        self.close()
+        self.server.stop_when_done()
+
+    def send_answer(self, line):
+        # stdout stays open after stdin is closed
+        sys.stdout.write(line)
+        sys.stdout.flush()
+
+
+class WakeupChannel(asyncore.file_dispatcher):
+    # The read end of a pipe the worker pool writes to when a result is ready, so the event loop wakes up to handle
+    # it.
+    #
+    # @param server the SolvingServer
+    # @param map the socket map of the server
+    def __init__(self, server, map=None):
+        read_fd, self.write_fd = os.pipe()
+        asyncore.file_dispatcher.__init__(self, read_fd, map)
+        os.close(read_fd)
+        self.server = server
+
+    def wake(self):
+        """
+        Method to wake the event loop up, called from the result thread of the pool
+
+        :return:
+        """
+        os.write(self.write_fd, b'.')
+
+    def writable(self):
+        return False
+
+    def handle_read(self):
+        self.recv(4096)
+        self.server.handle_results()
+
+
+class Listener(asyncore.dispatcher):
+    # Accepts the client connections of a local port.
+    #
+    # @param server the SolvingServer
+    # @param host
+    # @param port 0 for a free port, see get_port
+    # @param map the socket map of the server
+    def __init__(self, server, host, port, map=None):
+        asyncore.dispatcher.__init__(self, map=map)
+        self.server = server
+        self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.set_reuse_addr()
+        self.bind((host, port))
+        self.listen(64)
+
+    def get_port(self):
+        return self.socket.getsockname()[1]
+
+    def handle_accept(self):
+        pair = self.accept()
+        if pair is not None:
+            RequestChannel(self.server, pair[0], self._map)
+
+
+class SolvingServer:
+    # Creates a server and its worker pool. Requests are read once listen or read_stdin is called and serve runs.
+    #
+    # @param workers number of worker processes
+    # @param mapping_method mapping method of the Agent of every worker
+    # @param timeout seconds from reading a request to answering it before it is answered with timeout, also the
+    #                deadline its worker solves it by
+    # @param max_pending number of requests queued or solving at which the server stops reading requests
+    # @param budget seconds a worker may spend on a problem before answering with the best answer found, None for
+    #               no limit
+    def __init__(self, workers=multiprocessing.cpu_count(), mapping_method='branch_and_bound', timeout=10.0,
+                 max_pending=64, budget=None):
+        self.workers = workers
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self.budget = budget
+        # the workers are forked before any socket is opened
+        self.pool = multiprocessing.Pool(workers, init_worker, (mapping_method,))
+        self.map = {}
+        self.wakeup = WakeupChannel(self, self.map)
+
+        self.request_ids = itertools.count()
+        # requests waiting for a worker, and requests being solved by id
+        self.queue = collections.deque()
+        self.solving = {}
+        # (request, result) of the requests the pool finished, filled by the result thread of the pool
+        self.results = collections.deque()
+        self.stopping = False
+        self.counts = {'ok': 0, 'truncated': 0, 'timeout': 0, 'error': 0}
+
+    def listen(self, host='127.0.0.1', port=0):
+        """
+        Method to accept requests from the connections to a local port
+
+        :param host:
+        :param port: 0 for a free port
+        :return: the port
+        """
+        return Listener(self, host, port, self.map).get_port()
+
+    def read_stdin(self):
+        """
+        Method to read requests from stdin and write the answers to stdout
+
+        :return:
+        """
+        StdinChannel(self, self.map)
+
+    def get_pending(self):
+        """
+        Method to get the number of requests queued or solving
+
+        :return:
+        """
+        return len(self.queue) + len(self.solving)
+
+    def is_accepting(self):
+        """
+        Method to check if the server reads new requests, see max_pending
+
+        :return:
+        """
+        return self.get_pending() < self.max_pending
+
+    def submit(self, channel, text):
+        """
+        Method to queue a request read from a channel
+
+        :param channel:
+        :param text: the text of the problem file
+        :return:
+        """
+        self.queue.append({
+            'id': next(self.request_ids),
+            'channel': channel,
+            'name': text.split('\n', 1)[0],
+            'text': text,
+            'deadline': time.time() + self.timeout,
+            'status': None
+        })
+        self.dispatch()
+
+    def dispatch(self):
+        """
+        Method to hand the queued requests to the idle workers, with the deadlines of the requests
+
+        :return:
+        """
+        while self.queue and len(self.solving) < self.workers:
+            request = self.queue.popleft()
+            if request.get('deadline') <= time.time():
+                self.answer(request, 'timeout')
+                continue
+            self.solving[request.get('id')] = request
+            self.pool.apply_async(solve_text, (request.get('text'), request.get('deadline'), self.budget),
+                                  callback=lambda result, request=request: self.add_result(request, result))
+
+    def add_result(self, request, result):
+        """
+        Method to pass the result of a request from the result thread of the pool to the event loop
+
+        :param request:
+        :param result:
+        :return:
+        """
+        self.results.append((request, result))
+        self.wakeup.wake()
+
+    def handle_results(self):
+        """
+        Method to answer the requests the pool finished and give their workers the next queued requests
+
+        :return:
+        """
+        while self.results:
+            request, (status, answer) = self.results.popleft()
+            del self.solving[request.get('id')]
+            self.answer(request, status, answer)
+        self.dispatch()
+
+    def answer(self, request, status, answer=''):
+        """
+        Method to send the answer of a request back to its channel, unless it was already answered with timeout
+
+        :param request:
+        :param status: 'ok', 'truncated', 'timeout' or 'error'
+        :param answer:
+        :return:
+        """
+        if request.get('status') is not None:
+            return
+        request['status'] = status
+        self.counts[status] += 1
+        request.get('channel').send_answer('%s\t%s\t%s\n' % (request.get('name'), status,
+                                                             ' '.join(str(answer).split())))
+
+    def check_timeouts(self):
+        """
+        Method to answer the requests past their deadline with timeout. Queued requests are dropped, solving ones
+        keep their worker until the agent returns, which it does soon after the deadline
+
+        :return:
+        """
+        now = time.time()
+        while self.queue and self.queue[0].get('deadline') <= now:
+            self.answer(self.queue.popleft(), 'timeout')
+        for request in self.solving.values():
+            if request.get('deadline') <= now:
+                self.answer(request, 'timeout')
+
+    def stop_when_done(self):
+        """
+        Method to stop serve once every request is answered
+
+        :return:
+        """
+        self.stopping = True
+
+    def serve(self):
+        """
+        Method to run the event loop until stop_when_done is called and every request is answered
+
+        :return:
+        """
+        while not (self.stopping and self.get_pending() == 0):
+            asyncore.loop(timeout=TICK, map=self.map, count=1)
+            self.check_timeouts()
+        # send what is left in the output buffers
+        while any(channel.writable() for channel in self.map.values() if isinstance(channel, RequestChannel)):
+            asyncore.loop(timeout=TICK, map=self.map, count=1)
+
+    def close(self):
+        """
+        Method to close every connection and stop the worker pool
+
+        :return:
+        """
+        asyncore.close_all(self.map)
+        self.pool.terminate()
+        self.pool.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve answers to problems sent over a local socket or stdin')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--stdin', action='store_true', help='read problems from stdin instead of a socket')
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--mapping-method', default='branch_and_bound',
+                        choices=['exhaustive', 'branch_and_bound', 'assignment'])
+    parser.add_argument('--timeout', type=float, default=10.0,
+                        help='seconds before a request is answered timeout and its worker stops searching')
+    parser.add_argument('--max-pending', type=int, default=64,
+                        help='requests queued or solving at which the server stops reading new ones')
+    parser.add_argument('--budget', type=float,
+                        help='seconds to solve a problem in before answering with the best answer found')
+    args = parser.parse_args()
+
+    server = SolvingServer(args.workers, args.mapping_method, args.timeout, args.max_pending, args.budget)
+    # stop like on Ctrl-C when terminated, the workers are already forked and keep the default handler
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        if args.stdin:
+            server.read_stdin()
+        else:
+            port = server.listen(args.host, args.port)
+            print('listening on %s:%d' % (args.host, port), file=sys.stderr)
+        server.serve()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        print('answered ok %(ok)d, truncated %(truncated)d, timeout %(timeout)d, error %(error)d' % server.counts,
+              file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
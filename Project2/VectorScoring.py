@@ -0,0 +1,158 @@
+# Batched scoring of answer options with numpy.
+#
+# Every (option object, guess object) pair of every option becomes one row of a set
+# of attribute matrices, with one column per interned attribute id. A cell holds a
+# small code of the value set of the attribute (-1 if the object does not have the
+# attribute) and whether the value set only holds object names. The points of
+# Agent.calculate_similarity_points are then computed for every row at once and
+# summed per option. The cells of an object only depend on the object and the object
+# names of the figures it is scored in, so an Encoder encodes the row of each object
+# once and the matrices of an option set are stacked from its cache. numpy is optional:
+# without it numpy is None and the Agent keeps scoring options one by one.
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# Number of encoded objects an Encoder keeps before it starts over
+MAX_ENCODED_OBJECTS = 100000
+
+
+class Encoder:
+    # Encodes compact objects as attribute matrix rows, caching the row of every object by the object names it is
+    # scored with, the number of attributes and its signature. A cell of a row is -1 if the object does not have the
+    # attribute, else twice the code of its value set plus one if the value set only holds object names.
+    #
+    # @param vocabulary the Vocabulary the objects are interned in
+    def __init__(self, vocabulary):
+        self.vocabulary = vocabulary
+        # value mask -> small code, masks can be wider than 64 bits so equal masks get equal codes instead
+        self.codes = {}
+        # (name mask, number of attributes) -> {signature: row of an object}
+        self.rows = {}
+        self.num_rows = 0
+
+    def get_rows(self, name_mask, num_attributes):
+        """
+        Method to get the cached rows of the objects scored with a name mask
+
+        :param name_mask: value mask of the object names of both figures
+        :param num_attributes:
+        :return: {signature: row}
+        """
+        rows = self.rows.get((name_mask, num_attributes))
+        if rows is None:
+            rows = self.rows[(name_mask, num_attributes)] = {}
+        return rows
+
+    def start(self):
+        """
+        Method to start encoding an option set, starting the cache over if it is full. The rows of one option set
+        are compared with each other, so the codes only change between option sets
+
+        :return:
+        """
+        if self.num_rows >= MAX_ENCODED_OBJECTS:
+            self.codes = {}
+            self.rows = {}
+            self.num_rows = 0
+
+    def encode_object(self, obj, name_mask, rows):
+        """
+        Method to encode the attribute matrix row of an object and cache it
+
+        :param obj: CompactObject
+        :param name_mask: value mask of the object names of both figures
+        :param rows: the cached rows of name_mask, see get_rows
+        :return: numpy array with a cell per attribute id
+        """
+        codes = self.codes
+        cells = [-1] * len(self.vocabulary.attribute_ids)
+        for attr, mask in obj.masks.iteritems():
+            cells[attr] = 2 * codes.setdefault(mask, len(codes)) + (mask is not None and mask & ~name_mask == 0)
+        row = rows[obj.signature] = numpy.array(cells, dtype=numpy.int32)
+        self.num_rows += 1
+        return row
+
+
+def encode_options(encoder, candidates):
+    """
+    Method to encode the object pairs of every option as attribute matrices. The pairs are the objects of the
+    option and the objects with the same name in its guess figure, as in Agent.match_figures_new
+
+    :param encoder: Encoder
+    :param candidates: list of (compact option figure, compact guess figure, name mask), see
+    Agent.get_compact_pair
+    :return: dictionary of numpy arrays, rows are the object pairs
+    """
+    encoder.start()
+    shape_id = encoder.vocabulary.get_attribute_id('shape')
+    num_attributes = len(encoder.vocabulary.attribute_ids)
+    encode_object = encoder.encode_object
+
+    # the rows of every pair, from the cache of the encoder when it has them, stacked into the matrices at once
+    src_rows = []
+    dest_rows = []
+    num_pairs = []
+    for compact_option, compact_guess, name_mask in candidates:
+        count = len(src_rows)
+        rows = encoder.get_rows(name_mask, num_attributes)
+        for name, option_obj in compact_option.iteritems():
+            guess_obj = compact_guess.get(name)
+            if guess_obj is not None:
+                src_row = rows.get(option_obj.signature)
+                dest_row = rows.get(guess_obj.signature)
+                src_rows.append(src_row if src_row is not None else encode_object(option_obj, name_mask, rows))
+                dest_rows.append(dest_row if dest_row is not None else encode_object(guess_obj, name_mask, rows))
+        num_pairs.append(len(src_rows) - count)
+
+    if not src_rows:
+        src_rows = dest_rows = [numpy.zeros(0, dtype=numpy.int32)]
+    return {
+        'shapeId': shape_id,
+        'src': numpy.concatenate(src_rows).reshape(-1, num_attributes),
+        'dest': numpy.concatenate(dest_rows).reshape(-1, num_attributes),
+        'owner': numpy.repeat(numpy.arange(len(candidates)), num_pairs)
+    }
+
+
+def score_options(encoder, candidates, by_shape=False):
+    """
+    Method to score every option against its guess figure in one pass, giving the same weights as
+    Agent.match_figures_new
+
+    :param encoder: Encoder
+    :param candidates: list of (compact option figure, compact guess figure, name mask), see
+    Agent.get_compact_pair
+    :param by_shape:
+    :return: list of the weight of each candidate
+    """
+    encoded = encode_options(encoder, candidates)
+    shape_id = encoded.get('shapeId')
+    src = encoded.get('src')
+    dest = encoded.get('dest')
+
+    # a missing attribute is -1 and a position is odd, so an even cell is an attribute other than a position, and
+    # equal cells of present attributes have equal value sets
+    src_position = src & 1
+    src_missing = src < 0
+    dest_missing = dest < 0
+    equal = (src == dest) & ~src_missing
+
+    # equal value sets get a point, and one more if they are positions; a changed value gets half a point when
+    # matching by shape; an attribute deleted or added, other than a position, loses a point
+    points = equal * (1.0 + src_position)
+    if by_shape:
+        points += 0.5 * (~src_missing & ~dest_missing & ~equal)
+    points -= (src_position == 0) & dest_missing
+    points -= ((dest & 1) == 0) & src_missing
+    points[:, shape_id] = 0
+
+    # an empty guess object loses a point
+    row_points = points.sum(axis=1) - dest_missing.all(axis=1)
+    if by_shape:
+        row_points += equal[:, shape_id]
+
+    weights = numpy.bincount(encoded.get('owner'), weights=row_points, minlength=len(candidates))
+    return [float(weight) for weight in weights]
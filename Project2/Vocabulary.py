@@ -0,0 +1,75 @@
+# Interned, compact representation of the objects of a figure.
+#
+# Attribute names are interned to small integer ids and attribute values to bits,
+# so a list of values becomes one integer mask. Comparing two value sets, or
+# checking that a value set only holds object names, becomes an integer operation.
+
+# An object of a figure as a dictionary of attribute id -> value mask, built once
+# from a {attr: [value, ...]} dictionary. A value of None is kept as None.
+class CompactObject(object):
+    __slots__ = ('masks', 'signature')
+
+    def __init__(self, masks):
+        self.masks = masks
+        # hashable canonical form of the object, equal for objects with the same attribute value sets
+        self.signature = frozenset(masks.iteritems())
+
+    def __len__(self):
+        return len(self.masks)
+
+class Vocabulary:
+    # Creates a new empty vocabulary. Ids are assigned in the order the strings
+    # are first seen and are never reused.
+    def __init__(self):
+        self.attribute_ids = {}
+        self.value_bits = {}
+
+    def get_attribute_id(self, name):
+        """
+        Method to get the id of an attribute name, interning the name if it is new
+
+        :param name:
+        :return:
+        """
+        attribute_id = self.attribute_ids.get(name)
+        if attribute_id is None:
+            attribute_id = self.attribute_ids[name] = len(self.attribute_ids)
+        return attribute_id
+
+    def get_value_mask(self, values):
+        """
+        Method to get the bit mask of a list of values, interning the values that are new
+        i.e. ['Y', 'X'] with Y interned to bit 1 and X to bit 2
+        6
+
+        :param values:
+        :return:
+        """
+        if values is None:
+            return None
+        mask = 0
+        for value in values:
+            bit = self.value_bits.get(value)
+            if bit is None:
+                bit = self.value_bits[value] = 1 << len(self.value_bits)
+            mask |= bit
+        return mask
+
+    def get_compact_object(self, obj):
+        """
+        Method to convert an object dictionary into a CompactObject
+
+        :param obj:
+        :return:
+        """
+        return CompactObject(dict((self.get_attribute_id(attr), self.get_value_mask(val))
+                                  for attr, val in obj.iteritems()))
+
+    def get_compact_figure(self, figure):
+        """
+        Method to convert every object of a figure dictionary into a CompactObject
+
+        :param figure:
+        :return:
+        """
+        return dict((name, self.get_compact_object(obj)) for name, obj in figure.iteritems())